@@ -1,7 +1,7 @@
-from src.utils.constants import raw_data_df
+from src.utils.constants import load_raw_data_df
 from src.data.fixes_modify_df import fix_apostrophes
+from src.data.utterance_features import get_utterance_features
 import pandas as pd
-import string
 import plotly.express as px
 
 #TODO maybe use it to find bad conversations with very long durations (like with answering machines)
@@ -17,24 +17,10 @@ def process_and_plot_avg_word_duration(df: pd.DataFrame, plot: bool = True) -> p
         pd.DataFrame: The processed DataFrame with the average word duration calculated.
     """
 
-    def get_avg_word_duration(df_row):
-        words = df_row['text']
-        words = words.translate(str.maketrans('', '', string.punctuation))  # Remove punctuation before splitt
-        words = words.split()
-        num_of_words = len(words)
-        duration = df_row['duration']
-
-        if duration < 0:  # Negative duration represents final utterance of conversation
-            duration = 0
-
-        if num_of_words == 0:
-            return 0
-        else:
-            return duration / num_of_words
-
-    # Apply fixes and calculate average word duration
+    # Apply fixes and calculate average word duration (duration / number of words without punctuation)
+    # The features are computed on the fixed text, so they are not read from the feature store of the raw text
     new_df = fix_apostrophes(df)
-    new_df['avg_word_duration'] = new_df.apply(get_avg_word_duration, axis=1)
+    new_df['avg_word_duration'] = get_utterance_features(new_df, columns=['avg_word_duration'])['avg_word_duration']
 
     # Optionally plot the results
     if plot:
@@ -44,4 +30,4 @@ def process_and_plot_avg_word_duration(df: pd.DataFrame, plot: bool = True) -> p
     return new_df
 
 
-process_and_plot_avg_word_duration(raw_data_df)
\ No newline at end of file
+process_and_plot_avg_word_duration(load_raw_data_df(columns=['recording_id', 'text', 'duration']))
\ No newline at end of file
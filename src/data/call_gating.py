@@ -0,0 +1,107 @@
+"""
+This script contains a cheap gating stage that scores recordings from metadata and simple text statistics only,
+so answering machines, voicemail, IVR menus and hold messages are excluded (or deprioritized) before any model runs.
+1. The per-conversation summary table (number of utterances, durations, number of speakers) is combined with
+   vectorized text statistics: number of words, utterances with IVR/voicemail boilerplate and repeated utterances
+   (short backchannel utterances such as 'okay' or 'yes' repeat in normal calls, so they are not counted).
+2. Each recording gets a flag per signal, and the gate score is the number of flags that are on.
+3. Recordings with gate_score >= min_flags are gated (not compliance conversations).
+"""
+
+import pandas as pd
+
+from src.data.conversation_summary import get_conversation_summary
+
+# Phrases of voicemail greetings, IVR menus and hold messages
+BOILERPLATE_PATTERN = (
+    r'leave (?:a|your) (?:message|name)|after the (?:tone|beep)|record your message|(?:voice ?mail|mailbox)'
+    r'|(?:is )?not available|press (?:one|two|three|four|five|six|seven|eight|nine|zero|pound|star|\d)'
+    r'|your call is (?:important|being transferred)|please (?:stay on the line|hold)|thank you for calling'
+    r'|(?:the|this) call may be (?:monitored|recorded)|office is (?:currently )?closed|business hours'
+)
+
+# Default thresholds of the gating signals (durations are in the units of the 'time' column)
+GATE_THRESHOLDS = {
+    'max_utterances_of_answering_machine': 5,  # Few utterances ...
+    'min_total_duration_of_answering_machine': 30,  # ... over a long time
+    'min_words_per_time_unit': 0.5,  # Less speech than this is silence or hold music
+    'max_boilerplate_ratio': 0.5,  # Share of utterances with IVR/voicemail phrases
+    'max_repeated_ratio': 0.5,  # Share of utterances that repeat an earlier utterance of the recording
+    'min_words_of_repeated_utterance': 4  # Shorter utterances are backchannel ('okay', 'yes', 'thank you')
+}
+
+# Gating signals (flag columns of the scores table)
+GATE_FLAGS = ['single_speaker', 'answering_machine', 'low_speech_rate', 'boilerplate', 'repetitive']
+
+
+def score_calls(df: pd.DataFrame, thresholds=None) -> pd.DataFrame:
+    """
+    Scores the recordings for gating.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with columns 'recording_id', 'speaker', 'time', 'duration' and 'text'.
+        thresholds (dict): Thresholds that override the defaults of GATE_THRESHOLDS.
+
+    Returns:
+        pd.DataFrame: One row per recording_id (the index) with the signals ('words_per_time_unit',
+                      'boilerplate_ratio', 'repeated_ratio'), a Boolean column per flag of GATE_FLAGS and 'gate_score'
+                      (number of flags that are on).
+    """
+    thresholds = {**GATE_THRESHOLDS, **(thresholds or {})}
+    summary = get_conversation_summary(df, ['num_utterances', 'total_duration', 'num_speakers'])
+
+    # Text statistics of all utterances in one pass each, aggregated in a single groupby
+    normalized_text = df['text'].str.lower().str.replace(r'[^\w ]+', '', regex=True).str.strip()
+    num_words = df['text'].str.count(r'\S+')
+    is_repeated = pd.DataFrame({'recording_id': df['recording_id'], 'text': normalized_text}).duplicated()
+    text_stats = pd.DataFrame({
+        'recording_id': df['recording_id'],
+        'num_words': num_words,
+        'is_boilerplate': df['text'].str.contains(BOILERPLATE_PATTERN, case=False, regex=True),
+        'is_repeated': is_repeated & (num_words >= thresholds['min_words_of_repeated_utterance'])
+    })
+    text_stats = text_stats.groupby('recording_id', observed=True).agg(
+        num_words=('num_words', 'sum'),
+        num_boilerplate=('is_boilerplate', 'sum'),
+        num_repeated=('is_repeated', 'sum')
+    ).reindex(summary.index)
+
+    scores = pd.DataFrame(index=summary.index)
+    total_duration = summary['total_duration'].where(summary['total_duration'] > 0)
+    scores['words_per_time_unit'] = text_stats['num_words'] / total_duration
+    scores['boilerplate_ratio'] = text_stats['num_boilerplate'] / summary['num_utterances']
+    scores['repeated_ratio'] = text_stats['num_repeated'] / summary['num_utterances']
+
+    scores['single_speaker'] = summary['num_speakers'] < 2
+    scores['answering_machine'] = ((summary['num_utterances'] <= thresholds['max_utterances_of_answering_machine']) &
+                                   (summary['total_duration'] > thresholds['min_total_duration_of_answering_machine']))
+    scores['low_speech_rate'] = scores['words_per_time_unit'] < thresholds['min_words_per_time_unit']
+    scores['boilerplate'] = scores['boilerplate_ratio'] > thresholds['max_boilerplate_ratio']
+    scores['repetitive'] = scores['repeated_ratio'] > thresholds['max_repeated_ratio']
+    scores['gate_score'] = scores[GATE_FLAGS].sum(axis=1)
+    return scores
+
+
+def get_gated_recordings(df: pd.DataFrame, min_flags=1, thresholds=None) -> list:
+    """
+    Returns the IDs of the recordings that are gated (at least min_flags flags are on).
+    """
+    scores = score_calls(df, thresholds)
+    return scores.index[scores['gate_score'] >= min_flags].to_list()
+
+
+def get_recordings_to_process(df: pd.DataFrame, min_flags=1, deprioritize=False, thresholds=None) -> list:
+    """
+    Returns the IDs of the recordings to run models on.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame.
+        min_flags (int): Minimal number of flags of a gated recording.
+        deprioritize (bool): If True, gated recordings are kept at the end of the list (ordered by gate score)
+                             instead of being excluded.
+        thresholds (dict): Thresholds that override the defaults of GATE_THRESHOLDS.
+    """
+    scores = score_calls(df, thresholds)
+    if deprioritize:
+        return scores.sort_values('gate_score', kind='stable').index.to_list()
+    return scores.index[scores['gate_score'] < min_flags].to_list()
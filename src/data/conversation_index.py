@@ -0,0 +1,71 @@
+"""
+This script contains a conversation index over the utterances DataFrame.
+The utterances are sorted once by (recording_id, time), and an offset table maps each recording_id to the
+(start_row, end_row) range of its utterances. Getting the utterances of a single recording is then a
+constant-time lookup and a zero-copy row slice, instead of a boolean mask over the entire DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class ConversationIndex:
+    """
+    Utterances sorted by (recording_id, time) with a recording_id -> (start_row, end_row) offset table.
+
+    Attributes:
+        df (pd.DataFrame): The sorted utterances (the original index labels are kept).
+        offsets (pd.DataFrame): One row per recording with columns 'recording_id', 'start_row' and 'end_row'.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        recording_codes, recording_ids = pd.factorize(df['recording_id'], sort=True)
+        self._order = np.lexsort((df['time'].to_numpy(), recording_codes))  # Stable for equal times
+        self.df = df.iloc[self._order]
+
+        sorted_codes = recording_codes[self._order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.concatenate(([0], boundaries)) if len(sorted_codes) else np.array([], dtype=np.int64)
+        ends = np.concatenate((boundaries, [len(sorted_codes)])) if len(sorted_codes) else np.array([], dtype=np.int64)
+        present_ids = np.asarray(recording_ids, dtype=object)[sorted_codes[starts]]
+
+        self.offsets = pd.DataFrame({'recording_id': present_ids, 'start_row': starts, 'end_row': ends})
+        self._offsets = dict(zip(present_ids, zip(starts.tolist(), ends.tolist())))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, recording_id):
+        return recording_id in self._offsets
+
+    def __iter__(self):
+        """
+        Yields (recording_id, utterances DataFrame) pairs, in recording_id order.
+        """
+        for recording_id, (start, end) in self._offsets.items():
+            yield recording_id, self.df.iloc[start:end]
+
+    @property
+    def recording_ids(self) -> list:
+        return list(self._offsets)
+
+    def get(self, recording_id) -> pd.DataFrame:
+        """
+        Returns the utterances of a single recording, sorted by time (a row slice of the sorted DataFrame).
+        """
+        start, end = self._offsets[recording_id]
+        return self.df.iloc[start:end]
+
+    def size(self, recording_id) -> int:
+        """
+        Returns the number of utterances in the recording.
+        """
+        start, end = self._offsets[recording_id]
+        return end - start
+
+    def row_positions(self, recording_id) -> np.ndarray:
+        """
+        Returns the positions (0-based row numbers) of the recording's utterances in the original DataFrame.
+        """
+        start, end = self._offsets[recording_id]
+        return self._order[start:end]
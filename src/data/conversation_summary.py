@@ -0,0 +1,139 @@
+"""
+This script contains a per-conversation summary table, computed with grouped aggregations over the utterances
+DataFrame, and cached, so the conversation filters (fixes_filter, call_gating) are cheap lookups on it.
+1. One row per recording_id with: number of utterances, total duration (starting time of the last utterance),
+   sum, max and average of the utterance durations, number of speakers and number of question marks.
+2. Only the summary columns a caller asks for are computed, from the source columns they need (e.g., the number of
+   utterances needs only 'recording_id'), so a DataFrame with some of the columns loaded can be summarized.
+3. The summary is cached per DataFrame object (checked against a weak reference), with a fingerprint of each source
+   column: a cached summary column is recomputed when one of its source columns changed. Numeric and categorical
+   columns are hashed in full, text columns (e.g., 'recording_id', 'text') on their length and a sample of rows,
+   so a lookup does not hash all the texts. invalidate_conversation_summary clears the cache explicitly.
+"""
+
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Source columns of each summary column (besides 'recording_id')
+SUMMARY_SOURCE_COLUMNS = {
+    'num_utterances': [],
+    'total_duration': ['time'],
+    'sum_utterance_duration': ['duration'],
+    'max_utterance_duration': ['duration'],
+    'avg_utterance_duration': ['duration'],
+    'num_speakers': ['speaker'],
+    'num_question_marks': ['text']
+}
+
+# Columns of the summary table (the index is recording_id)
+SUMMARY_COLUMNS = list(SUMMARY_SOURCE_COLUMNS)
+
+# Maximal number of cached summaries (one per DataFrame)
+MAX_CACHED_SUMMARIES = 4
+
+# Number of rows of a text column hashed for its fingerprint
+FINGERPRINT_SAMPLE_SIZE = 10_000
+
+# id(df) -> (weak reference to df, fingerprints of the source columns, summary table)
+_summary_cache = OrderedDict()
+
+
+def _column_fingerprint(column: pd.Series) -> tuple:
+    """
+    Returns a fingerprint of a source column: the hash of all its values (numeric and categorical columns), or of
+    its length and a sample of evenly spaced rows (other columns, such as strings).
+    """
+    if not (pd.api.types.is_numeric_dtype(column) or isinstance(column.dtype, pd.CategoricalDtype)) \
+            and len(column) > FINGERPRINT_SAMPLE_SIZE:
+        column = column.iloc[np.linspace(0, len(column) - 1, FINGERPRINT_SAMPLE_SIZE).astype(int)]
+    return str(column.dtype), hash(pd.util.hash_pandas_object(column, index=False).to_numpy().tobytes())
+
+
+def compute_conversation_summary(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    Computes the summary table of the conversations (not cached).
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with 'recording_id' and the source columns of the requested summary
+                           columns (see SUMMARY_SOURCE_COLUMNS).
+        columns (list): Summary columns to compute (default: SUMMARY_COLUMNS).
+
+    Returns:
+        pd.DataFrame: One row per recording_id (the index) with the requested columns.
+    """
+    columns = SUMMARY_COLUMNS if columns is None else list(columns)
+    unknown_columns = set(columns) - set(SUMMARY_COLUMNS)
+    if unknown_columns:
+        raise ValueError(f"Unknown summary columns: {sorted(unknown_columns)} (options: {SUMMARY_COLUMNS})")
+
+    df_temp = pd.DataFrame({'recording_id': df['recording_id']})
+    aggregations = {'num_utterances': ('recording_id', 'size')}
+    if 'total_duration' in columns:
+        df_temp['time'] = df['time']
+        aggregations['total_duration'] = ('time', 'max')  # Starting time of the last utterance
+    if {'sum_utterance_duration', 'max_utterance_duration', 'avg_utterance_duration'} & set(columns):
+        df_temp['duration'] = df['duration']
+        aggregations['sum_utterance_duration'] = ('duration', 'sum')
+        aggregations['max_utterance_duration'] = ('duration', 'max')
+    if 'num_speakers' in columns:
+        df_temp['speaker'] = df['speaker']
+        aggregations['num_speakers'] = ('speaker', 'nunique')
+    if 'num_question_marks' in columns:
+        df_temp['num_question_marks'] = df['text'].str.count(r'\?')
+        aggregations['num_question_marks'] = ('num_question_marks', 'sum')
+
+    summary = df_temp.groupby('recording_id', observed=True).agg(**aggregations)
+    if 'avg_utterance_duration' in columns:
+        summary['avg_utterance_duration'] = summary['sum_utterance_duration'] / summary['num_utterances']
+    return summary[columns]
+
+
+def get_conversation_summary(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    Returns the summary table of the conversations (the requested columns, default: SUMMARY_COLUMNS), from the
+    cache of df if these columns were already computed. The returned table should not be modified.
+    """
+    columns = SUMMARY_COLUMNS if columns is None else list(columns)
+    source_columns = dict.fromkeys(['recording_id'] + [source_column for column in columns
+                                                       for source_column in SUMMARY_SOURCE_COLUMNS.get(column, [])])
+    fingerprints = {source_column: (len(df), _column_fingerprint(df[source_column]))
+                    for source_column in source_columns}
+
+    key = id(df)
+    cached = _summary_cache.get(key)
+    if cached is not None and cached[0]() is df and cached[1]['recording_id'] == fingerprints['recording_id']:
+        _summary_cache.move_to_end(key)
+        cached_fingerprints = dict(cached[1])
+        # Keep the cached columns whose source columns did not change
+        changed_sources = {source_column for source_column, fingerprint in fingerprints.items()
+                           if cached_fingerprints.get(source_column, fingerprint) != fingerprint}
+        summary = cached[2][[column for column in cached[2].columns
+                             if not changed_sources & set(SUMMARY_SOURCE_COLUMNS[column])]]
+        cached_fingerprints.update(fingerprints)
+        fingerprints = cached_fingerprints
+    else:
+        summary = None
+
+    missing_columns = columns if summary is None else [column for column in columns
+                                                        if column not in summary.columns]
+    if missing_columns:
+        new_summary = compute_conversation_summary(df, missing_columns)
+        summary = new_summary if summary is None else summary.join(new_summary)
+    _summary_cache[key] = (weakref.ref(df), fingerprints, summary)
+    _summary_cache.move_to_end(key)
+    if len(_summary_cache) > MAX_CACHED_SUMMARIES:
+        _summary_cache.popitem(last=False)
+    return summary[columns]
+
+
+def invalidate_conversation_summary(df: pd.DataFrame = None):
+    """
+    Clears the cached summary table of df, or all the cached tables.
+    """
+    if df is None:
+        _summary_cache.clear()
+    else:
+        _summary_cache.pop(id(df), None)
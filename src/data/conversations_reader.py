@@ -0,0 +1,146 @@
+"""
+This script provides a streaming reader for the merged conversations data.
+It yields (file_name, content) pairs one conversation at a time, where content is the dictionary of a single
+transcript file ({'transcript': [...]}), from either:
+1. The merged JSON file (all_conversations_raw_files.json) - parsed incrementally, without loading the entire file.
+2. Compressed JSON Lines shards (see merge_json_files_to_shards) - a shards folder or a single shard file.
+Memory use is bounded by the size of a single conversation.
+"""
+
+import io
+import json
+import os
+
+from src.data.merge_json_files import SHARD_EXTENSIONS, SHARDS_INDEX_FILE, open_shard
+
+
+def iter_conversations(source_path, chunk_size=1024 * 1024):
+    """
+    Yields (file_name, content) pairs lazily from the merged JSON file or from JSON Lines shards.
+
+    Args:
+        source_path (str): Path of the merged JSON file, of a shards folder or of a single shard file.
+        chunk_size (int): Number of characters read at a time from the merged JSON file.
+
+    Yields:
+        tuple: (file_name, content) for each conversation, in the order they were written.
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"The file {source_path} does not exist.")
+
+    if os.path.isdir(source_path):
+        yield from _iter_shards_folder(source_path)
+    elif source_path.endswith(tuple(SHARD_EXTENSIONS.values())):
+        yield from _iter_shard_file(source_path)
+    else:
+        with open(source_path, 'r') as source_file:
+            yield from _iter_json_object_items(source_file, chunk_size)
+
+
+def get_conversation(source_path, file_name):
+    """
+    Returns the content of a single conversation. For a shards folder, only the shard holding it is read.
+
+    Args:
+        source_path (str): Path of the merged JSON file, of a shards folder or of a single shard file.
+        file_name (str): Name of the conversation's file (key in the merged JSON).
+
+    Returns:
+        dict: The conversation's content.
+    """
+    if os.path.isdir(source_path):
+        shards_index = _load_shards_index(source_path)
+        for shard in shards_index['shards']:
+            if file_name in shard['file_names']:
+                source_path = os.path.join(source_path, shard['shard'])
+                break
+        else:
+            raise KeyError(file_name)
+
+    for current_file_name, content in iter_conversations(source_path):
+        if current_file_name == file_name:
+            return content
+    raise KeyError(file_name)
+
+
+def _load_shards_index(shards_folder_path):
+    with open(os.path.join(shards_folder_path, SHARDS_INDEX_FILE), 'r') as index_file:
+        return json.load(index_file)
+
+
+def _iter_shards_folder(shards_folder_path):
+    shards_index = _load_shards_index(shards_folder_path)
+    for shard in shards_index['shards']:
+        yield from _iter_shard_file(os.path.join(shards_folder_path, shard['shard']))
+
+
+def _iter_shard_file(shard_path):
+    with open_shard(shard_path, 'rb') as shard_file:
+        for line in io.BufferedReader(shard_file):
+            if line.strip():
+                record = json.loads(line)
+                yield record['file_name'], record['content']
+
+
+def _iter_json_object_items(text_file, chunk_size):
+    """
+    Incrementally parses a file holding a single JSON object and yields its (key, value) pairs.
+    Only the text of the current item is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = text_file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            read_more()
+
+    def expect(characters):
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] not in characters:
+            raise ValueError(f"Invalid JSON: expected one of {characters!r} at position {pos}")
+        return buffer[pos]
+
+    def decode():
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()  # The value is not complete in the buffer yet
+                continue
+            pos = end
+            return value
+
+    expect('{')
+    pos += 1
+    if expect('}"') == '}':
+        return
+    while True:
+        key = decode()
+        expect(':')
+        pos += 1
+        value = decode()
+        yield key, value
+        buffer, pos = buffer[pos:], 0  # Releases the text of the yielded item
+        separator = expect(',}')
+        pos += 1
+        if separator == '}':
+            return
@@ -0,0 +1,171 @@
+"""
+This script contains the corpus statistics engine: per-conversation and per-speaker metrics of the utterances
+DataFrame, computed with grouped vectorized aggregations (no loop over utterances).
+1. Per (recording_id, speaker): number of utterances, words and single question marks, talk time (sum of the
+   utterance durations), average word duration and talk/listen ratio (talk time / conversation duration).
+2. Per recording_id: number of utterances and speakers, conversation duration, min/max utterance length (words)
+   and duration, number of question marks, the speaker with the most question marks and the speaker with the
+   highest talk/listen ratio.
+   The conversation duration is the starting time of the last utterance (the time before the first utterance is
+   counted, but not for any speaker, and is not an utterance duration). The end time of the last utterance of a
+   recording is unknown, so it is left out of the min/max utterance duration (NaN for a single-utterance recording).
+3. The statistics are saved to a single Parquet file (one row per recording and speaker, with the recording's
+   statistics on each of its rows), optionally computed in parallel over the shards of a sharded dataset.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from src.data.sharded_dataset import load_manifest, read_shard
+from src.data.utterance_features import compact_feature_store, get_utterance_features
+
+# Columns of the utterances DataFrame that the statistics are computed from
+STATISTICS_SOURCE_COLUMNS = ['file_name', 'recording_id', 'member_id', 'utterance_id', 'speaker', 'time', 'text',
+                             'duration']
+
+SPEAKER_COLUMNS = ['speaker_num_of_utterances', 'speaker_num_of_words', 'speaker_num_of_question_marks',
+                   'speaker_talk_time', 'speaker_avg_word_duration', 'speaker_talk_listen_ratio']
+
+CONVERSATION_COLUMNS = ['file_name', 'member_id', 'num_of_utterances', 'num_of_speakers', 'conversation_duration',
+                        'min_utterance_length', 'max_utterance_length', 'min_utterance_duration',
+                        'max_utterance_duration', 'num_of_question_marks', 'speaker_with_max_question_marks',
+                        'speaker_with_highest_talk_listen_ratio']
+
+
+def compute_corpus_statistics(df: pd.DataFrame, feature_store_path=None) -> pd.DataFrame:
+    """
+    Computes the per-speaker and per-conversation statistics of an utterances DataFrame.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with the columns of STATISTICS_SOURCE_COLUMNS.
+        feature_store_path (str): Path of the utterance feature store (default: the features are computed).
+
+    Returns:
+        pd.DataFrame: One row per (recording_id, speaker) with the columns of SPEAKER_COLUMNS and of
+                      CONVERSATION_COLUMNS (the statistics of the recording, repeated on each of its speakers).
+                      Empty (with these columns) if df is empty, e.g., an empty shard.
+    """
+    if len(df) == 0:
+        return pd.DataFrame(columns=['recording_id', 'speaker'] + CONVERSATION_COLUMNS + SPEAKER_COLUMNS)
+
+    features = get_utterance_features(df, feature_store_path, columns=['num_of_words', 'num_of_single_qmarks'])
+
+    # The last utterance (by time) of each recording has an unknown duration
+    recording_codes = pd.factorize(df['recording_id'])[0]
+    order = np.lexsort((df['time'].to_numpy(), recording_codes))
+    is_last = np.zeros(len(df), dtype=bool)
+    is_last[order[np.append(recording_codes[order][1:] != recording_codes[order][:-1], True)]] = True
+
+    utterances = pd.DataFrame({
+        'recording_id': df['recording_id'].astype(str).to_numpy(),
+        'speaker': df['speaker'].astype(str).to_numpy(),
+        'file_name': df['file_name'].astype(str).to_numpy(),
+        'member_id': df['member_id'].astype(str).to_numpy(),
+        'time': df['time'].to_numpy(),
+        'duration': df['duration'].to_numpy(),
+        'known_duration': df['duration'].where(~is_last).to_numpy(),
+        'num_of_words': features['num_of_words'].to_numpy(),
+        'num_of_question_marks': features['num_of_single_qmarks'].to_numpy()
+    })
+
+    # Per-speaker statistics (one grouped aggregation)
+    speakers = utterances.groupby(['recording_id', 'speaker'], sort=True).agg(
+        speaker_num_of_utterances=('duration', 'size'),
+        speaker_num_of_words=('num_of_words', 'sum'),
+        speaker_num_of_question_marks=('num_of_question_marks', 'sum'),
+        speaker_talk_time=('duration', 'sum')
+    )
+    num_of_words = speakers['speaker_num_of_words']
+    speakers['speaker_avg_word_duration'] = speakers['speaker_talk_time'] / num_of_words.where(num_of_words > 0)
+
+    # Per-conversation statistics (one grouped aggregation)
+    conversations = utterances.groupby('recording_id', sort=True).agg(
+        file_name=('file_name', 'first'),
+        member_id=('member_id', 'first'),
+        num_of_utterances=('duration', 'size'),
+        num_of_speakers=('speaker', 'nunique'),
+        conversation_duration=('time', 'max'),  # Starting time of the last utterance
+        min_utterance_length=('num_of_words', 'min'),
+        max_utterance_length=('num_of_words', 'max'),
+        min_utterance_duration=('known_duration', 'min'),
+        max_utterance_duration=('known_duration', 'max'),
+        num_of_question_marks=('num_of_question_marks', 'sum')
+    )
+    conversation_duration = conversations['conversation_duration'].reindex(
+        speakers.index.get_level_values('recording_id'))
+    speakers['speaker_talk_listen_ratio'] = (speakers['speaker_talk_time'] /
+                                             conversation_duration.where(conversation_duration > 0).to_numpy())
+
+    # Speakers with the most question marks (if any) and with the highest talk/listen ratio (ties: first speaker)
+    speaker_names = speakers.index.get_level_values('speaker').to_numpy()
+    recording_level = speakers.index.get_level_values('recording_id')
+    max_question_rows = speakers['speaker_num_of_question_marks'].reset_index(drop=True).groupby(
+        recording_level.to_numpy()).idxmax()
+    conversations['speaker_with_max_question_marks'] = pd.Series(
+        speaker_names[max_question_rows.to_numpy()], index=max_question_rows.index).where(
+        conversations['num_of_question_marks'] > 0)
+    talk_listen_ratio = speakers['speaker_talk_listen_ratio'].reset_index(drop=True)
+    has_talk_time = talk_listen_ratio.notna().to_numpy()
+    max_ratio_rows = talk_listen_ratio[has_talk_time].groupby(recording_level.to_numpy()[has_talk_time]).idxmax()
+    conversations['speaker_with_highest_talk_listen_ratio'] = pd.Series(
+        speaker_names[max_ratio_rows.to_numpy()], index=max_ratio_rows.index)
+
+    statistics = speakers.reset_index().merge(conversations[CONVERSATION_COLUMNS].reset_index(), on='recording_id')
+    return statistics[['recording_id', 'speaker'] + CONVERSATION_COLUMNS + SPEAKER_COLUMNS]
+
+
+def get_conversation_statistics(statistics: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the per-conversation statistics (one row per recording_id) from the output of compute_corpus_statistics.
+    """
+    return statistics.drop_duplicates('recording_id')[['recording_id'] + CONVERSATION_COLUMNS].reset_index(drop=True)
+
+
+def _compute_shard_statistics(dataset_path, shard_index, feature_store_path=None) -> pd.DataFrame:
+    return compute_corpus_statistics(read_shard(dataset_path, shard_index, columns=STATISTICS_SOURCE_COLUMNS),
+                                     feature_store_path)
+
+
+def compute_corpus_statistics_from_shards(dataset_path, n_jobs=1, feature_store_path=None) -> pd.DataFrame:
+    """
+    Computes the statistics of a sharded dataset (see sharded_dataset), one shard per task. Shards hold whole
+    recordings, so the statistics of each shard are final.
+
+    Args:
+        dataset_path (str): Path of the sharded dataset folder.
+        n_jobs (int): Number of worker processes (1 - sequential, None - all CPU cores).
+        feature_store_path (str): Path of the utterance feature store (default: the features are computed).
+                                  Workers append their new rows as separate part files, compacted at the end.
+    """
+    num_shards = load_manifest(dataset_path)['num_shards']
+    compute_shard_statistics = partial(_compute_shard_statistics, dataset_path,
+                                       feature_store_path=feature_store_path)
+    if n_jobs == 1:
+        shard_statistics = [compute_shard_statistics(shard_index) for shard_index in range(num_shards)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            shard_statistics = list(pool.map(compute_shard_statistics, range(num_shards)))
+        if feature_store_path is not None:
+            compact_feature_store(feature_store_path)
+    # Empty shards are left out (their empty frames would turn the concatenated columns into object columns)
+    statistics = pd.concat([shard_statistics_df for shard_statistics_df in shard_statistics if len(shard_statistics_df)]
+                           or shard_statistics[:1], ignore_index=True)
+    return statistics.sort_values(['recording_id', 'speaker'], kind='stable').reset_index(drop=True)
+
+
+def save_corpus_statistics(statistics: pd.DataFrame, output_file_path):
+    """
+    Saves the statistics to a single Parquet file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_file_path)), exist_ok=True)
+    statistics.to_parquet(output_file_path, index=False)
+
+
+def load_corpus_statistics(output_file_path, columns=None) -> pd.DataFrame:
+    if not os.path.exists(output_file_path):
+        raise FileNotFoundError(f"File not found: {output_file_path}")
+    return pd.read_parquet(output_file_path, columns=columns)
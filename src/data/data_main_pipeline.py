@@ -2,13 +2,17 @@
 Main pipeline for data processing.
 Gets a path to a folder with all conversation transcripts in JSON format.
 Cleans the data and returns a pandas dataframe with all utterances from all conversations.
+The stages run over process pools, so the pipeline runs only under `if __name__ == '__main__'` (with the spawn
+start method, on Windows and macOS, each worker process imports this script).
 """
 import os
 from data_pipeline_functions import (import_data,
                                      clean_data,
                                      nlp_preprocessing,
                                      identify_care_manager)
+from src.data.find_cm import find_care_manager
 from src.utils.common import get_project_root
+from src.utils.constants import utterance_features_path
 
 
 # Getting folder's path
@@ -16,16 +20,29 @@ project_root = get_project_root()
 raw_files_path = os.path.join(project_root, 'data', 'raw_files')
 cities_file = os.path.join(project_root, 'src', 'data', 'us_cities.csv')
 
+# CM identification: 'recorded' / max question marks (identify_care_manager), or
+# 'recorded' / 'this is' / max question marks (find_care_manager)
+use_three_signal_cm = False
 
-# Importing data
-raw_df = import_data(raw_files_path)
-df = raw_df.copy()
 
-# Identify CM and add Boolean column to the df
-df = identify_care_manager(df)
+def main():
+    # Importing data
+    raw_df = import_data(raw_files_path, n_jobs=None, verbose=True)
+    df = raw_df.copy()
 
-# Cleaning data
-df = clean_data(df, cities_file=cities_file, cities_threshold=3)
+    # Identify CM and add Boolean column to the df (on all CPU cores, by chunks of whole recordings).
+    # The text signals of the utterances are read from the feature store (computed for new or changed utterances)
+    if use_three_signal_cm:
+        df = find_care_manager(df, feature_store_path=utterance_features_path)
+    else:
+        df = identify_care_manager(df, n_jobs=None, feature_store_path=utterance_features_path)
 
+    # Cleaning data
+    df = clean_data(df, cities_file=cities_file, cities_threshold=3, n_jobs=None)
 
-print(df.columns)
\ No newline at end of file
+    print(df.columns)
+    return df
+
+
+if __name__ == '__main__':
+    main()
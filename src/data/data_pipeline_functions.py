@@ -12,113 +12,79 @@ import numpy as np
 import pandas as pd
 import os
 import json
-import regex as re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 # Data
 # todo: organize data import functions from raw_files json
-from src.utils.common import (get_project_root,
-                              load_json_data)
+from src.utils.common import get_project_root
+from src.data.transcripts_ingestion import read_transcripts
 
 # Functions to fix de-identification issues
-from src.data.fixes_modify_df import (fix_apostrophes,
-                             fix_strings_with_I,
-                             fix_portland)
+from src.data.fixes_modify_df import fix_de_identification
 
 # Filter short conversations
 from src.data.fixes_filter import get_long_convs
 
+# Gate answering machines, IVR and hold-music calls
+from src.data.call_gating import get_recordings_to_process
 
-def add_file_data_to_data_list(file: str, content: dict,
-                               data_for_dataframe: list):
-    """
-    Unpacks file data into the data_for_dataframe list
-    :param file: File name.
-    :param content: A dictionary with key: transcript, value: list of dictionaries containing the data of all utterances
-                    of the transcript
-    :param data_for_dataframe: The list of unpacked utterances data to be updated
-    :returns: Updates the list 'data_for_dataframe'.
-    """
-    member_id, recording_id = file.split('_')
-    recording_id = recording_id.split('.')[0]
-    utterances = content['transcript']
-    times = []
-    start_index = len(data_for_dataframe)
-    for utterance in utterances:
-        data_for_dataframe.append({
-            "file_name": file,
-            "recording_id": recording_id,
-            "member_id": member_id,
-            'utterance_id': utterance['id'],
-            'speaker': utterance['speaker'][-1],
-            'time': utterance['time'],
-            'text': utterance['text']
-        })
-        times.append(utterance['time'])
-    if times:
-        times = np.array(times)
-        times_shifted = np.append(times[1:], 0)
-        durations = times_shifted - times
-        for ind in range(len(durations)):
-            data_for_dataframe[start_index + ind]['duration'] = durations[ind]
-    else:
-        for ind in range(start_index, len(data_for_dataframe)):
-            data_for_dataframe[ind]['duration'] = None
-
-    return data_for_dataframe
-
-
-def import_data(folder_path):
+# Per-utterance features (question marks, 'recorded' flags)
+from src.data.utterance_features import compact_feature_store, get_utterance_features
+
+
+def import_data(folder_path, n_jobs=1, use_threads=False, verbose=False):
     """
     Unpack all json files into a Pandas DataFrame.
     :param folder_path: Path of the folder containing the json files.
+    :param n_jobs: Number of workers parsing the files in parallel (1 - sequential, None - all CPU cores).
+    :param use_threads: If True, parses the files over a thread pool instead of a process pool.
+    :param verbose: If True, prints the ingestion throughput (files/sec and utterances/sec).
     """
-
-    data_for_dataframe = []
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        content = load_json_data(file_path)
-        file = filename.split('.')[0]
-        add_file_data_to_data_list(file, content,
-                                   data_for_dataframe)
-
-    raw_df = pd.DataFrame(data_for_dataframe)
+    raw_df = read_transcripts(folder_path, n_jobs=n_jobs, use_threads=use_threads, verbose=verbose)
     return raw_df
 
 
-def clean_data(raw_df: pd.DataFrame, cities_file, cities_threshold=3):
+def clean_data(raw_df: pd.DataFrame, cities_file, cities_threshold=3, gate_calls=False, n_jobs=1):
     """
     :type raw_df: input utterances dataframe to be processed
-    :param cities_file: path of csv file with US cities names (for fix_portland function)
-    :param cities_threshold: for fix_portland function
+    :param cities_file: path of csv file with US cities names (for the fix_portland step)
+    :param cities_threshold: for the fix_portland step
+    :param gate_calls: If True, also removes answering machines, IVR and hold-music calls (see call_gating)
+    :param n_jobs: Number of worker processes (1 - sequential, None - all CPU cores). Each worker cleans whole
+                   recordings, so the per-recording steps (e.g., the cities threshold) give the same result.
+                   With n_jobs != 1, call it under `if __name__ == '__main__'` (see run_by_recordings).
     """
+    if n_jobs != 1:
+        return run_by_recordings(partial(clean_data, cities_file=cities_file, cities_threshold=cities_threshold,
+                                         gate_calls=gate_calls), raw_df, n_jobs=n_jobs)
+
     def clean_de_identification(df: pd.DataFrame, cities_file, cities_threshold):
         """
-        Run all functions that fix de-identification problems.
+        Run all functions that fix de-identification problems
+        (fix_apostrophes, fix_strings_with_I and fix_portland, fused into a single pass).
         """
-        df_copy = df.copy()
-        df_copy = fix_apostrophes(df_copy, plot_cases=False)
-        df_copy = fix_strings_with_I(df_copy)
-        df_copy = fix_portland(df_copy, cities_file=cities_file, cities_threshold=cities_threshold)
-        return df_copy
+        return fix_de_identification(df, cities_file=cities_file, cities_threshold=cities_threshold)
 
-    def clean_conversations(df: pd.DataFrame):
+    def clean_conversations(df: pd.DataFrame, gate_calls):
         """
         Filter utterances by conditions from different functions according to need.
         """
-        # todo: function to filter short convs with long utterances (answering machine)
         df_copy = df.copy()
         # Filter long conversations and answering machines
-        recordings_to_keep = list(set(get_long_convs(df_copy))) # & set(NEW FUNCTION))
-        df_copy = df_copy[df_copy['recording_id'].isin(recordings_to_keep)]
+        recordings_to_keep = set(get_long_convs(df_copy))
+        if gate_calls:
+            recordings_to_keep &= set(get_recordings_to_process(df_copy))
+        df_copy = df_copy[df_copy['recording_id'].isin(list(recordings_to_keep))]
         return df_copy
 
     df = raw_df.copy()
     df = clean_de_identification(df, cities_file=cities_file, cities_threshold=cities_threshold)
-    df = clean_conversations(df)
+    df = clean_conversations(df, gate_calls=gate_calls)
     return df
 
 
-def identify_care_manager(df: pd.DataFrame):
+def identify_care_manager(df: pd.DataFrame, n_jobs=1, feature_store_path=None):
     """
     Identifies the care manager in a dataset of conversation transcripts.
 
@@ -132,53 +98,103 @@ def identify_care_manager(df: pd.DataFrame):
 
     Args:
     df (pd.DataFrame): The input DataFrame with columns 'recording_id', 'speaker', and 'text'.
+    n_jobs (int): Number of worker processes (1 - sequential, None - all CPU cores). With n_jobs != 1, call it
+                  under `if __name__ == '__main__'` (see run_by_recordings).
+    feature_store_path (str): Path of the utterance feature store (default: the features are computed).
 
     Returns:
     pd.DataFrame: A copy of the input DataFrame with an added column 'is_cm'
                   indicating the identified care manager.
     """
-    def _count_single_question_marks(row_text):
-        text = row_text.replace(' ', '')
-        pattern = r'(\? *)(?!\?)'
-        matches = re.findall(pattern, text)
-        return len(matches)
-
-    def _has_recorded(row_text):
-        return 'recorded' in row_text.lower()
-
-
-    # Create copies of the data frame
-    df_temp = df.copy()
-
-    # Count question marks and check for 'recorded'
-    df_temp['num_of_qmarks'] = df_temp['text'].apply(_count_single_question_marks)
-    df_temp['has_recorded'] = df_temp['text'].apply(_has_recorded)
+    if n_jobs != 1:
+        df = run_by_recordings(partial(identify_care_manager, feature_store_path=feature_store_path), df,
+                               n_jobs=n_jobs).reset_index(drop=True)
+        if feature_store_path is not None:
+            compact_feature_store(feature_store_path)  # The part files of the workers
+        return df
+
+    # Integer keys for recording_id and speaker
+    # (speaker codes are sorted, so ties are resolved as with the original strings)
+    recording_keys = pd.factorize(df['recording_id'])[0].astype(np.int32)
+    speaker_keys = pd.factorize(df['speaker'], sort=True)[0].astype(np.int32)
+
+    # Single question marks (a '?' that is not followed by another '?', ignoring spaces) and 'recorded' flags
+    # of the utterances, from the feature store
+    features = get_utterance_features(df, feature_store_path, columns=['num_of_single_qmarks', 'has_recorded'])
+    df_temp = pd.DataFrame({
+        'recording_key': recording_keys,
+        'speaker_key': speaker_keys,
+        'num_of_qmarks': features['num_of_single_qmarks'].to_numpy(),
+        'has_recorded': features['has_recorded'].to_numpy()
+    })
 
     # Aggregate information by recording_id and speaker
-    agg_funcs = {
-        'num_of_qmarks': 'sum',
-        'has_recorded': 'sum'
-    }
-    df_agg = df_temp.groupby(['recording_id', 'speaker']).agg(agg_funcs).reset_index()
+    df_agg = df_temp.groupby(['recording_key', 'speaker_key']).agg(num_of_qmarks=('num_of_qmarks', 'sum'),
+                                                                   has_recorded=('has_recorded', 'sum'))
 
     # Determine the speaker with the maximum question marks per recording
-    df_agg['max_qmarks'] = df_agg.groupby('recording_id')['num_of_qmarks'].transform('max')
-    df_agg['is_speaker_with_max_qmarks'] = df_agg['num_of_qmarks'] == df_agg['max_qmarks']
+    recording_level = df_agg.index.get_level_values('recording_key')
+    max_qmarks = df_agg.groupby(level='recording_key')['num_of_qmarks'].transform('max')
+    is_speaker_with_max_qmarks = df_agg['num_of_qmarks'] == max_qmarks
 
     # Determine the speaker with 'recorded' in their utterances per recording
-    df_agg['is_speaker_with_recorded'] = df_agg['has_recorded'] > 0
+    is_speaker_with_recorded = df_agg['has_recorded'] > 0
 
     # Resolve conflicts: prioritize 'recorded' over max question marks
-    df_agg['priority'] = df_agg['is_speaker_with_recorded'].astype(int) * 2 + df_agg[
-        'is_speaker_with_max_qmarks'].astype(int)
-    df_agg['is_cm'] = df_agg.groupby('recording_id')['priority'].rank(method='first', ascending=False) == 1
+    priority = is_speaker_with_recorded.astype(int) * 2 + is_speaker_with_max_qmarks.astype(int)
+    is_cm = priority.groupby(recording_level).rank(method='first', ascending=False) == 1
 
-    # Merge the 'is_cm' flag back to the original dataframe
-    df_result = df.merge(df_agg[['recording_id', 'speaker', 'is_cm']], on=['recording_id', 'speaker'], how='left')
+    # Map the 'is_cm' flag back to the utterances through the (recording_key, speaker_key) MultiIndex
+    utterance_keys = pd.MultiIndex.from_arrays([recording_keys, speaker_keys])
+    df_result = df.reset_index(drop=True)
+    df_result['is_cm'] = is_cm.to_numpy()[df_agg.index.get_indexer(utterance_keys)]
 
     return df_result
 
 
+def split_by_recordings(df: pd.DataFrame, num_of_chunks) -> list:
+    """
+    Splits the utterances DataFrame into chunks of whole recordings (all utterances of a recording are in the
+    same chunk). The split is deterministic, and each chunk keeps the original row order.
+    """
+    recording_codes = pd.factorize(df['recording_id'])[0]
+    chunk_of_rows = recording_codes % num_of_chunks
+    chunks = [df[chunk_of_rows == chunk] for chunk in range(num_of_chunks)]
+    return [chunk for chunk in chunks if len(chunk)]
+
+
+def run_by_recordings(function, df: pd.DataFrame, n_jobs=None, chunks_per_job=4) -> pd.DataFrame:
+    """
+    Runs a function of an utterances DataFrame (e.g., clean_data or identify_care_manager) on chunks of whole
+    recordings over a process pool, and merges the results back in the original row order.
+    With the spawn start method (Windows, macOS), each worker process imports the calling script, so scripts that
+    call it (directly or with n_jobs != 1) must run their pipeline under `if __name__ == '__main__'`
+    (see data_main_pipeline.main).
+
+    Args:
+        function (function): Function that receives and returns an utterances DataFrame (must be picklable).
+        df (pd.DataFrame): The input DataFrame with a 'recording_id' column.
+        n_jobs (int): Number of worker processes (None - all CPU cores).
+        chunks_per_job (int): Number of chunks per worker (smaller chunks balance the load between workers).
+
+    Returns:
+        pd.DataFrame: The concatenated results, in the order of the rows of the input DataFrame.
+    """
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    df = df.assign(_row_order=np.arange(len(df)))
+    chunks = split_by_recordings(df, max(1, n_jobs * chunks_per_job))
+    if not chunks:
+        return function(df).drop(columns='_row_order')
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        results = list(pool.map(function, chunks))
+
+    df_result = pd.concat(results)
+    df_result = df_result.sort_values('_row_order', kind='stable')
+    return df_result.drop(columns='_row_order')
+
+
 def nlp_preprocessing(df: pd.DataFrame):
     # todo: documentation
     # todo:
@@ -197,7 +213,7 @@ def main():
     folder_path = os.path.join(project_root, 'data', 'raw_files')
 
     # Importing data
-    raw_df = import_data(folder_path)
+    raw_df = import_data(folder_path, n_jobs=None, verbose=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
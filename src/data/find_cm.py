@@ -1,127 +1,133 @@
 """
-Find CM by two metrics:
-1- The speaker with max(count) of questions marks
-2- The speaker who said 'recorded' first
-Column 'CM' holds values 'True' for CMs and 'False' for members
+Find CM by three metrics:
+1- The speaker who said 'recorded' first
+2- The speaker who said 'this is' first
+3- The speaker with max(count) of questions marks
+Column 'is_cm' holds values 'True' for CMs and 'False' for members
+
+The three signals are computed for all recordings in one vectorized sweep (first occurrences with masks and idxmin,
+question marks counted in one pass), and resolved with NumPy select logic (the rules of choose_CM).
+find_care_manager can be used instead of identify_care_manager in data_main_pipeline.
 """
 #imports
 import pandas as pd
 import numpy as np
 
-def count_question_marks(group):
-    group['?_count'] = group['text'].str.count(r'\?(\s*\?)+|\?')
-    #group['?_count'] = group['text'].str.count(r'\?')#
-    return group
-
-def first_recorded_speaker(df):
-    first_recorded = df[df['text'].str.contains(r'\recorded\b', case=False, na=False)].head(1)
-    if not first_recorded.empty:
-        df['first_recorded_speaker'] = first_recorded['speaker'].values[0]
-    else:
-        df['first_recorded_speaker'] = None
-    return df
-
-def first_this_is(df):
-    first_this_is = df[df['text'].str.contains(r'this is', case=False, na=False)].head(1)
-    if not first_this_is.empty:
-        df['first_this_is'] = first_this_is['speaker'].values[0]
-    else:
-        df['first_this_is'] = None
-    return df
-
-#def choose_CM(row):
-    #    if pd.isna(row['first_recorded_speaker']) and pd.isna(row['speaker_most']):
-    #        return np.nan
-    #   elif pd.isna(row['first_recorded_speaker']):
-    #        return row['speaker_most']
-    #    elif pd.isna(row['speaker_most']):
-    # row['first_recorded_speaker']
-    #   elif row['first_recorded_speaker'] == row['speaker_most']:
-    #       return row['first_recorded_speaker']
-    #   elif row['first_recorded_speaker'] != row['speaker_most']:
-#       return row['first_recorded_speaker']
-##
-def choose_CM(row):
-    if pd.isna(row['first_recorded_speaker']) and pd.isna(row['speaker_most']) & pd.isna(row['first_this_is']):
-        return np.nan
-
-    elif row['first_recorded_speaker'] == row['speaker_most'] == row['first_this_is']:
-        return row['first_recorded_speaker']
-
-    elif (row['first_recorded_speaker'] == (row['first_this_is'])) and (
-            row['first_recorded_speaker'] != row['speaker_most']):
-        return row['first_recorded_speaker']
-
-    elif pd.isna(row['first_recorded_speaker']):
-        return row['first_this_is']
-
-    elif pd.isna(row['first_this_is']):
-        return row['speaker_most']
-
-    elif pd.isna(row['speaker_most']):
-        return row['first_recorded_speaker']
-
-
-
-#upload data
-df = pd.read_csv('raw_df_.csv')
-
-#sort data by time, to find the first occurrence of the word 'recorded'
-df = df.sort_values(by=['recording_id', 'time'])
-
-#  identify the first occurrence of 'record'
-df_recorded = df.groupby('recording_id').apply(first_recorded_speaker)
-
-#prepare df for merge by 'recording_id'
-df_recorded = df_recorded[['first_recorded_speaker']].reset_index()[['recording_id','first_recorded_speaker']]
-df_recorded = df_recorded.drop_duplicates()
-df_recorded = df_recorded.set_index('recording_id')
-
-
-
-df_this_is = df.groupby('recording_id').apply(first_this_is)
-df_this_is = df_this_is[['first_this_is']].reset_index()[['recording_id','first_this_is']]
-df_this_is = df_this_is.drop_duplicates()
-df_this_is = df_this_is[['recording_id','first_this_is']].drop_duplicates().set_index('recording_id')
-
-
-df_ = df.copy()
-df_ = pd.merge(df_, df_recorded, on='recording_id', how='left')
-df_ = pd.merge(df_, df_this_is, on='recording_id', how='left')
-
-
-df_qmarks = df.sort_values(by=['recording_id', 'time']) #sort by id and time
-
-#find speaker with max(count) questions marks
-df_qmarks = df_qmarks.groupby(['recording_id', 'speaker']).apply(count_question_marks).reset_index(drop=True)
-question_counts = df_qmarks.groupby(['recording_id', 'speaker'])['?_count'].sum().reset_index()
-most_questions_speaker = question_counts.loc[question_counts.groupby('recording_id')['?_count'].idxmax()]
-df_qmarks = df_qmarks.merge(question_counts, on=['recording_id', 'speaker'], suffixes=('', '_sum'))
-df_qmarks = df_qmarks.merge(most_questions_speaker[['recording_id', 'speaker']], on='recording_id', suffixes=('', '_most'))
-df_qmarks = df_qmarks[['recording_id','speaker_most']].drop_duplicates().set_index('recording_id')
-
-
-df_ = pd.merge(df_, df_qmarks, on='recording_id', how='left')
-
-
-
-df_merged = df_[['recording_id','first_recorded_speaker','speaker_most','first_this_is']].drop_duplicates()
-
-
-df_merged['CM_'] = df_merged.apply(choose_CM, axis=1)
-df_CM = df_merged[['recording_id','CM_']]
-
-df_final = pd.merge(df_, df_CM, on='recording_id', how='left')
-
-df_final['CM'] = df_final['speaker'] == df_final['CM_']
-df_final = df_final.drop(columns=['CM_','Unnamed: 0','utterance_id','member_id','file_name'])
-#TODO remove redundant cols
-
-
-print(df_final.head())
-print(df_CM['CM_'].value_counts())
-
-#QA
-a = df_merged[df_merged['recording_id'] == '00190bc2-3aa4-43d5-9e92-5f6be6767f93']
-
-print('Completed!')
\ No newline at end of file
+from src.data.utterance_features import get_utterance_features
+
+
+def _first_speaker_with_mask(df, rank, recording_codes, mask):
+    """
+    Returns the speaker of the first utterance (by time) in the mask in each recording (indexed by recording code).
+    """
+    first_rows = pd.Series(rank[mask], index=np.flatnonzero(mask)).groupby(recording_codes[mask]).idxmin()
+    return pd.Series(df['speaker'].to_numpy()[first_rows.to_numpy()], index=first_rows.index, dtype=object)
+
+
+def _speaker_with_most_question_marks(df, recording_codes, question_marks):
+    """
+    Returns the speaker with the maximal number of question marks in each recording (indexed by recording code).
+    A sequence of question marks is counted once. Ties are resolved by the speaker name (the first one).
+    """
+    speaker_codes, speakers = pd.factorize(df['speaker'], sort=True)
+    question_counts = pd.DataFrame({
+        'recording_code': recording_codes,
+        'speaker_code': speaker_codes,
+        'count': question_marks
+    })
+    question_counts = question_counts[question_counts['speaker_code'] >= 0]
+    question_counts = question_counts.groupby(['recording_code', 'speaker_code'])['count'].sum()
+    most_questions = question_counts.groupby(level='recording_code').idxmax()
+    speaker_most_codes = np.array([speaker_code for _, speaker_code in most_questions], dtype=np.int64)
+    return pd.Series(np.asarray(speakers, dtype=object)[speaker_most_codes], index=most_questions.index, dtype=object)
+
+
+def choose_cm_speakers(cm_signals: pd.DataFrame) -> np.ndarray:
+    """
+    Resolves the CM of each recording from its three signals (vectorized version of choose_CM).
+
+    Args:
+        cm_signals (pd.DataFrame): Columns 'first_recorded_speaker', 'speaker_most' and 'first_this_is'.
+
+    Returns:
+        np.ndarray: The CM speaker of each row (None if not resolved).
+    """
+    recorded = cm_signals['first_recorded_speaker']
+    most = cm_signals['speaker_most']
+    this_is = cm_signals['first_this_is']
+
+    conditions = [
+        recorded.isna() & most.isna() & this_is.isna(),
+        (recorded == most) & (most == this_is),
+        (recorded == this_is) & (recorded != most),
+        recorded.isna(),
+        this_is.isna(),
+        most.isna()
+    ]
+    choices = [None, recorded, recorded, this_is, most, recorded]
+    choices = [np.full(len(cm_signals), None, dtype=object) if choice is None else choice.to_numpy(dtype=object)
+               for choice in choices]
+    cm_speakers = np.select(conditions, choices, default=None)
+    return np.where(pd.isna(cm_speakers), None, cm_speakers)
+
+
+def get_cm_signals(df: pd.DataFrame, feature_store_path=None) -> pd.DataFrame:
+    """
+    Computes the three signals and the CM speaker of each recording.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with columns 'recording_id', 'speaker', 'time' and 'text'.
+        feature_store_path (str): Path of the utterance feature store (default: the features are computed).
+
+    Returns:
+        pd.DataFrame: One row per recording_id (the index) with columns 'first_recorded_speaker', 'speaker_most',
+                      'first_this_is' and 'cm_speaker'.
+    """
+    recording_codes, recording_ids = pd.factorize(df['recording_id'])
+    # Rank of each utterance when sorted by recording_id and time (stable for equal times)
+    order = np.lexsort((df['time'].to_numpy(), recording_codes))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    features = get_utterance_features(df, feature_store_path,
+                                      columns=['has_recorded_word', 'num_of_question_marks', 'has_this_is'])
+    cm_signals = pd.DataFrame({
+        'first_recorded_speaker': _first_speaker_with_mask(df, rank, recording_codes,
+                                                           features['has_recorded_word'].to_numpy(dtype=bool)),
+        'speaker_most': _speaker_with_most_question_marks(df, recording_codes,
+                                                          features['num_of_question_marks'].to_numpy()),
+        'first_this_is': _first_speaker_with_mask(df, rank, recording_codes,
+                                                  features['has_this_is'].to_numpy(dtype=bool))
+    }, index=pd.RangeIndex(len(recording_ids)), dtype=object)
+    cm_signals['cm_speaker'] = choose_cm_speakers(cm_signals)
+    cm_signals.index = pd.Index(recording_ids, name='recording_id')
+    return cm_signals
+
+
+def find_care_manager(df: pd.DataFrame, feature_store_path=None) -> pd.DataFrame:
+    """
+    Identifies the care manager of each recording by the three signals.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with columns 'recording_id', 'speaker', 'time' and 'text'.
+        feature_store_path (str): Path of the utterance feature store (default: the features are computed).
+
+    Returns:
+        pd.DataFrame: A copy of the input DataFrame (same row order) with an added column 'is_cm'
+                      indicating the identified care manager.
+    """
+    recording_codes = pd.factorize(df['recording_id'])[0]
+    cm_speakers = get_cm_signals(df, feature_store_path)['cm_speaker'].to_numpy()
+    df_result = df.reset_index(drop=True)
+    df_result['is_cm'] = df_result['speaker'].to_numpy(dtype=object) == cm_speakers[recording_codes]
+    return df_result
+
+
+if __name__ == '__main__':
+    from src.utils.constants import load_raw_data_df
+
+    df = load_raw_data_df()
+    cm_signals = get_cm_signals(df)
+    print(cm_signals.head())
+    print(f"Recordings with an identified CM: {cm_signals['cm_speaker'].notna().sum()}/{len(cm_signals)}")
+    print('Completed!')
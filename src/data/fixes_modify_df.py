@@ -4,13 +4,22 @@ They take as an input df and return df.
 They can be used in a sequence (pipeline) to exert several modifications to a df.
 """
 
-from src.utils.constants import raw_data_df
 from src.utils.common import create_file_path
 import pandas as pd
 import re
 import os
 import matplotlib.pyplot as plt
 from collections import Counter
+from functools import lru_cache
+
+
+# Spelled-out letters followed by a contraction suffix (e.g., 'D O N t' -> "'t")
+APOSTROPHE_PATTERN = re.compile(r'([A-Z](?:\s[A-Z])+)(re|m|s|ll|ve|d|t|am)')
+
+# Spelled-out names that stand for "I"
+STRINGS_WITH_I = ["A M I R", "J A M E S", "H A D A S", "M I C H A E L",
+                  "A I D E N A M E S", "N U N E Z", "A V A", "G A B I"]
+STRINGS_WITH_I_PATTERN = re.compile('|'.join(re.escape(string) for string in STRINGS_WITH_I))
 
 
 def fix_apostrophes(df: pd.DataFrame, plot_cases=False) -> pd.DataFrame:
@@ -26,7 +35,6 @@ def fix_apostrophes(df: pd.DataFrame, plot_cases=False) -> pd.DataFrame:
         pd.DataFrame: The DataFrame with corrected text in the 'text' column.
     """
     df_copy = df.copy()
-    pattern = re.compile(r'([A-Z](?:\s[A-Z])+)(re|m|s|ll|ve|d|t|am)')
     case_counter = Counter()
 
     def replacement(match):
@@ -34,20 +42,12 @@ def fix_apostrophes(df: pd.DataFrame, plot_cases=False) -> pd.DataFrame:
         return "'" + match.group(2)
 
     def fix_text(text):
-        return re.sub(pattern, replacement, text)
+        return APOSTROPHE_PATTERN.sub(replacement, text)
 
     df_copy['text'] = df_copy['text'].apply(fix_text)
 
     if plot_cases:
-        cases = list(case_counter.keys())
-        counts = list(case_counter.values())
-
-        plt.figure(figsize=(10, 6))
-        plt.bar(cases, counts, color='skyblue')
-        plt.xlabel('Contraction Type')
-        plt.ylabel('Count')
-        plt.title('Counts of Different Contraction Types')
-        plt.show()
+        _plot_contraction_counts(case_counter)
 
     return df_copy
 
@@ -63,11 +63,9 @@ def fix_strings_with_I(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: The DataFrame with modified text in the 'text' column.
     """
     df_copy = df.copy()
-    strings_to_replace = ["A M I R", "J A M E S", "H A D A S", "M I C H A E L",
-                          "A I D E N A M E S", "N U N E Z", "A V A", "G A B I"]
 
     def replace_text(text):
-        for string in strings_to_replace:
+        for string in STRINGS_WITH_I:
             text = text.replace(string, "I")
         return text
 
@@ -90,55 +88,193 @@ def fix_portland(df: pd.DataFrame, cities_file: str, cities_threshold=10, plot_c
         pd.DataFrame: The DataFrame with city names replaced by "Okay.".
     """
     df_copy = df.copy()
+    df_copy['text'], city_counter = _replace_top_cities(df_copy['text'].tolist(), df_copy['recording_id'],
+                                                        cities_file, cities_threshold)
 
-    if os.path.exists(cities_file):
-        cities_df = pd.read_csv(cities_file)
-    else:
-        raise FileNotFoundError(f"File not found: {cities_file}")
+    # Plot the counts if requested
+    if plot_cases:
+        _plot_city_counts(city_counter, cities_threshold)
 
-    us_cities = cities_df['City'].tolist()
-    pattern = '|'.join(re.escape(city) + r'[.,?]' for city in us_cities) # will look for city name + "." or "," or "?"
+    return df_copy
 
-    # Initialize a counter to keep track of different city names replaced
-    city_counter = Counter()
 
-    df_copy['us_city'] = df_copy['text'].str.extract(f'({pattern})', expand=False)
-    only_convs_with_cities = df_copy[['recording_id', 'us_city']].dropna(subset=['us_city'])
+def _replace_top_cities(texts: list, recording_ids: pd.Series, cities_file: str, cities_threshold: int) -> tuple:
+    """
+    Finds the first city mention (city name + "." or "," or "?") of each utterance, the top city of each recording
+    and replaces the top city with "Okay." in the recordings where it is mentioned more than cities_threshold times.
 
-    cities_count_per_conv = only_convs_with_cities.pivot_table(
-        index='recording_id',
-        columns='us_city',
-        aggfunc='size',
-        fill_value=0
-    )
+    Args:
+        texts (list): Texts of the utterances (replaced in place).
+        recording_ids (pd.Series): Recording ID of each utterance (same order as texts).
 
-    cities_count_per_conv['top_city'] = cities_count_per_conv.idxmax(axis=1)
-    cities_count_per_conv['num_mentions'] = cities_count_per_conv.max(axis=1, numeric_only=True)
-    top_city_per_conv = cities_count_per_conv[['top_city', 'num_mentions']]
-    filtered_recordings = top_city_per_conv[top_city_per_conv['num_mentions'] > cities_threshold].index
+    Returns:
+        tuple: (list of the new texts, Counter of the replacements per city)
+    """
+    city_matcher = get_city_matcher(cities_file)
+    us_city = pd.Series([city_matcher.first_match(text) for text in texts], index=recording_ids.index, dtype=object)
+
+    # Top city of each recording: the most mentioned city (ties are broken by the city name)
+    city_mentions = pd.DataFrame({'recording_id': recording_ids, 'us_city': us_city}).dropna(subset=['us_city'])
+    cities_count_per_conv = city_mentions.groupby(['recording_id', 'us_city'], observed=True).size()
+    cities_count_per_conv = cities_count_per_conv.rename('num_mentions').reset_index()
+    cities_count_per_conv['us_city'] = cities_count_per_conv['us_city'].astype(str)
+    top_city_per_conv = (cities_count_per_conv
+                         .sort_values(['num_mentions', 'us_city'], ascending=[False, True], kind='stable')
+                         .drop_duplicates(subset='recording_id'))
+    top_city_per_conv = top_city_per_conv[top_city_per_conv['num_mentions'] > cities_threshold]
+
+    # Replace the top city in all the utterances of the filtered recordings (the city is a literal string)
+    top_city_of_recording = dict(zip(top_city_per_conv['recording_id'], top_city_per_conv['us_city']))
+    top_cities = recording_ids.map(top_city_of_recording).astype(object).tolist()
+    city_counter = Counter()
+    for row, top_city in enumerate(top_cities):
+        if isinstance(top_city, str):
+            city_counter[top_city] += texts[row].count(top_city)
+            texts[row] = texts[row].replace(top_city, 'Okay.')
+    return texts, city_counter
 
-    for recording_id in filtered_recordings:
-        top_city = top_city_per_conv.loc[recording_id, 'top_city']
-        pattern = re.escape(top_city)
-        # Count each replacement
-        city_counter[top_city] += df_copy.loc[df_copy['recording_id'] == recording_id, 'text'].str.count(pattern).sum()
 
-        df_copy.loc[df_copy['recording_id'] == recording_id, 'text'] = df_copy.loc[
-            df_copy['recording_id'] == recording_id, 'text'].str.replace(pattern, 'Okay.', regex=True)
+def fix_de_identification(df: pd.DataFrame, cities_file: str, cities_threshold=10, plot_cases=False) -> pd.DataFrame:
+    """
+    Runs fix_apostrophes, fix_strings_with_I and fix_portland (in this order) in a single pass per utterance,
+    on a single copy of the DataFrame. The output is identical to running the three functions in sequence.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame with a 'text' column and 'recording_id' column.
+        cities_file (str): Path to the CSV file containing US city names.
+        cities_threshold (int): Threshold for the number of city mentions to apply the replacement.
+        plot_cases (bool): If True, plots the counts of the contraction types and of the city names replaced.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the fixed text in the 'text' column.
+    """
+    df_fixed, fix_counts = normalize_de_identification(df, cities_file, cities_threshold)
 
-        # Plot the counts if requested
     if plot_cases:
-        total_count = sum(city_counter.values())
-        sorted_cities_counts = sorted(city_counter.items())
-        cities, counts = zip(*sorted_cities_counts)
-
-        plt.figure(figsize=(10, 6))
-        plt.bar(cities, counts, color='skyblue')
-        plt.xlabel('City Name')
-        plt.ylabel('Count')
-        plt.title('Counts of Different City Names Replaced', pad=20)
-        plt.text(0.5, 1.02, f'Threshold = {cities_threshold} | Total Count: {total_count}', ha='center', transform=plt.gca().transAxes)
-        plt.xticks(rotation=90)
-        plt.show()
-
-    return df_copy.drop('us_city', axis=1)
+        _plot_contraction_counts(fix_counts['contractions'])
+        _plot_city_counts(fix_counts['cities'], cities_threshold)
+
+    return df_fixed
+
+
+def normalize_de_identification(df: pd.DataFrame, cities_file: str, cities_threshold=10) -> tuple:
+    """
+    Fused de-identification normalizer (see fix_de_identification) that also returns the counts of each fix type.
+
+    Returns:
+        tuple: (fixed DataFrame, dictionary with a Counter per fix type: 'contractions' (per contraction suffix),
+                'strings_with_I' (per replaced string) and 'cities' (per replaced city))
+    """
+    contraction_counter = Counter()
+    strings_with_I_counter = Counter()
+
+    def replacement(match):
+        contraction_counter[match.group(2)] += 1
+        return "'" + match.group(2)
+
+    def fix_text(text):
+        text = APOSTROPHE_PATTERN.sub(replacement, text)
+        # The replacements run in sequence (as in fix_strings_with_I) only for texts with at least one string
+        if STRINGS_WITH_I_PATTERN.search(text):
+            for string in STRINGS_WITH_I:
+                count = text.count(string)
+                if count:
+                    strings_with_I_counter[string] += count
+                    text = text.replace(string, "I")
+        return text
+
+    df_copy = df.copy()
+    texts = [fix_text(text) for text in df_copy['text']]
+    df_copy['text'], city_counter = _replace_top_cities(texts, df_copy['recording_id'], cities_file, cities_threshold)
+
+    fix_counts = {'contractions': contraction_counter, 'strings_with_I': strings_with_I_counter, 'cities': city_counter}
+    return df_copy, fix_counts
+
+
+def _plot_contraction_counts(case_counter: Counter):
+    cases = list(case_counter.keys())
+    counts = list(case_counter.values())
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(cases, counts, color='skyblue')
+    plt.xlabel('Contraction Type')
+    plt.ylabel('Count')
+    plt.title('Counts of Different Contraction Types')
+    plt.show()
+
+
+class CityMatcher:
+    """
+    Finds US city names followed by "." or "," or "?" in a text, with a single trie-compiled regex.
+    The first match of a text is the same as the first match of the regex alternation of all the cities
+    (in the order of the cities file): the leftmost position and, if several cities match there, the first city
+    in the file.
+    """
+
+    def __init__(self, cities):
+        self._trie = {}
+        for order, city in enumerate(cities):
+            node = self._trie
+            for char in city:
+                node = node.setdefault(char, {})
+            node.setdefault('', order)  # '' marks the end of a city name (value: its first position in the file)
+        self.pattern = re.compile(_trie_to_regex(self._trie) + r'[.,?]')
+
+    def first_match(self, text):
+        """
+        Returns the first city mention in the text (including the punctuation mark), or None.
+        """
+        match = self.pattern.search(text)
+        if match is None:
+            return None
+
+        # All the cities that match at the start position; the first one in the file is the match of the alternation
+        start = match.start()
+        node, best_order, best_end = self._trie, None, None
+        for end in range(start, len(text)):
+            node = node.get(text[end])
+            if node is None:
+                break
+            if '' in node and end + 1 < len(text) and text[end + 1] in '.,?' and \
+                    (best_order is None or node[''] < best_order):
+                best_order, best_end = node[''], end + 2
+        return text[start:best_end]
+
+
+def _trie_to_regex(node) -> str:
+    alternatives = [re.escape(char) + _trie_to_regex(node[char]) for char in sorted(key for key in node if key)]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in node:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')' + ('?' if '' in node else '')
+
+
+@lru_cache(maxsize=4)
+def _load_city_matcher(cities_file, modification_time):
+    cities_df = pd.read_csv(cities_file)
+    return CityMatcher(cities_df['City'].tolist())
+
+
+def get_city_matcher(cities_file: str) -> CityMatcher:
+    """
+    Returns the city matcher of the cities file (compiled once per file, and again if the file changes).
+    """
+    if not os.path.exists(cities_file):
+        raise FileNotFoundError(f"File not found: {cities_file}")
+    return _load_city_matcher(cities_file, os.path.getmtime(cities_file))
+
+
+def _plot_city_counts(city_counter: Counter, cities_threshold):
+    total_count = sum(city_counter.values())
+    sorted_cities_counts = sorted(city_counter.items())
+    cities, counts = zip(*sorted_cities_counts) if sorted_cities_counts else ((), ())
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(cities, counts, color='skyblue')
+    plt.xlabel('City Name')
+    plt.ylabel('Count')
+    plt.title('Counts of Different City Names Replaced', pad=20)
+    plt.text(0.5, 1.02, f'Threshold = {cities_threshold} | Total Count: {total_count}', ha='center', transform=plt.gca().transAxes)
+    plt.xticks(rotation=90)
+    plt.show()
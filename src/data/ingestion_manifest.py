@@ -0,0 +1,146 @@
+"""
+This script ingests conversation transcripts incrementally into the utterance store.
+1. An ingestion manifest (JSON file) records the path, size, modification time and content hash of each
+   transcript file that was already ingested.
+2. On every run, only new or changed files are parsed. Files with the same size and modification time as in
+   the manifest are skipped without being read, other files are skipped if their content hash did not change.
+3. The utterances of new / changed files are upserted into the Parquet utterance store, and the utterances of
+   files that were removed from the folder are deleted from it.
+"""
+
+import hashlib
+import json
+import os
+
+from src.utils.common import get_project_root
+from src.data.transcripts_ingestion import read_transcripts
+from src.data.utterance_store import (write_utterance_store,
+                                      delete_recordings_from_utterance_store)
+
+
+def compute_file_hash(file_path: str, chunk_size=1024 * 1024) -> str:
+    """
+    Returns the SHA-256 hash (hex) of the file's content.
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_file_record(folder_path: str, filename: str, file_hash=None) -> dict:
+    """
+    Returns the manifest record of a single file: path (relative to the folder), size, mtime and content hash.
+    """
+    file_path = os.path.join(folder_path, filename)
+    file_stat = os.stat(file_path)
+    return {
+        'path': filename,
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime,
+        'sha256': file_hash if file_hash is not None else compute_file_hash(file_path)
+    }
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """
+    Loads the ingestion manifest (file name -> file record). Returns an empty manifest if the file does not exist.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest: dict, manifest_path: str):
+    """
+    Saves the ingestion manifest. The file is replaced only after the new manifest was written completely.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    os.replace(temp_path, manifest_path)
+
+
+def find_changed_files(folder_path: str, manifest: dict):
+    """
+    Compares the JSON files in the folder with the manifest.
+
+    Args:
+        folder_path (str): Path of the folder containing the json files.
+        manifest (dict): The current ingestion manifest.
+
+    Returns:
+        tuple: (list of new or changed file names, list of removed file names, updated manifest)
+    """
+    changed_files = []
+    updated_manifest = {}
+    filenames = sorted(file for file in os.listdir(folder_path) if file.endswith('.json'))
+
+    for filename in filenames:
+        record = manifest.get(filename)
+        file_stat = os.stat(os.path.join(folder_path, filename))
+        if record is not None and record['size'] == file_stat.st_size and record['mtime'] == file_stat.st_mtime:
+            updated_manifest[filename] = record
+            continue
+
+        new_record = get_file_record(folder_path, filename)
+        if record is None or record['sha256'] != new_record['sha256']:
+            changed_files.append(filename)
+        updated_manifest[filename] = new_record  # Also refreshes the mtime of files that were only touched
+
+    removed_files = sorted(set(manifest) - set(updated_manifest))
+    return changed_files, removed_files, updated_manifest
+
+
+def _file_recording_id(filename: str) -> str:
+    return filename.split('.')[0].split('_')[1]
+
+
+def ingest_incremental(folder_path: str, store_path: str, manifest_path: str, n_jobs=1, use_threads=False,
+                       verbose=False):
+    """
+    Parses only new or changed transcript files and upserts their utterances into the utterance store.
+
+    Args:
+        folder_path (str): Path of the folder containing the json files.
+        store_path (str): Path of the Parquet utterance store.
+        manifest_path (str): Path of the ingestion manifest (JSON).
+        n_jobs (int): Number of workers parsing the files in parallel (1 - sequential, None - all CPU cores).
+        use_threads (bool): If True, parses the files over a thread pool instead of a process pool.
+        verbose (bool): If True, prints a summary of the run.
+
+    Returns:
+        tuple: (list of ingested file names, list of removed file names)
+    """
+    manifest = load_manifest(manifest_path)
+    changed_files, removed_files, updated_manifest = find_changed_files(folder_path, manifest)
+
+    if verbose:
+        print(f'{len(changed_files)} new or changed files, {len(removed_files)} removed files, '
+              f'{len(updated_manifest) - len(changed_files)} unchanged files')
+
+    # Remove old versions of changed files (and removed files) before writing the new utterances
+    recordings_to_delete = [_file_recording_id(filename) for filename in changed_files + removed_files]
+    delete_recordings_from_utterance_store(store_path, recordings_to_delete)
+
+    if changed_files:
+        new_df = read_transcripts(folder_path, filenames=changed_files, n_jobs=n_jobs, use_threads=use_threads,
+                                  verbose=verbose)
+        write_utterance_store(new_df, store_path, mode='append')
+
+    # The manifest is updated only after the store was updated successfully
+    save_manifest(updated_manifest, manifest_path)
+
+    return changed_files, removed_files
+
+
+if __name__ == '__main__':
+    project_root = get_project_root()
+    raw_files_path = os.path.join(project_root, 'data', 'raw_files')
+    store_path = os.path.join(project_root, 'data', 'processed', 'utterance_store')
+    manifest_path = os.path.join(project_root, 'data', 'processed', 'ingestion_manifest.json')
+
+    ingest_incremental(raw_files_path, store_path, manifest_path, n_jobs=None, verbose=True)
@@ -3,11 +3,21 @@ This script merges multiple JSON files from a specified folder into a single JSO
 1. Reads JSON files from a given source folder.
 2. Merges the content of all JSON files into a single JSON object.
 3. Writes the merged JSON content to a specified target file.
+
+Alternatively (merge_json_files_to_shards), the conversations are streamed one at a time into compressed
+JSON Lines shards (gzip or zstd) with a small shard index, so that memory use does not grow with the corpus.
 """
 
+import gzip
 import json
 import os
-from src.utils.common import get_project_root
+from src.utils.common import get_project_root, create_folder
+
+# Extension of the shard files for each compression type
+SHARD_EXTENSIONS = {None: '.jsonl', 'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+# Name of the shard index file (in the shards folder)
+SHARDS_INDEX_FILE = 'shards_index.json'
 
 def merge_json_files(source_folder_path, target_file_path):
     '''
@@ -70,7 +80,95 @@ def merge_json_files(source_folder_path, target_file_path):
 
     print(f'Finished loading content of {files_count} files')
 
-project_root = get_project_root()
-source_folder_path = os.path.join(project_root, 'data', 'raw_files')
-target_file_path = os.path.join(project_root, 'data', 'processed', 'merged_conversations', 'all_conversations_merged.json')
-merge_json_files(source_folder_path, target_file_path)
+
+def open_shard(shard_path, mode='rb', compression_level=None):
+    """
+    Opens a JSON Lines shard file as a binary stream. The compression is inferred from the file's extension.
+
+    :param shard_path: Path of the shard file ('.jsonl', '.jsonl.gz' or '.jsonl.zst').
+    :param mode: 'rb' for reading or 'wb' for writing.
+    :param compression_level: Compression level used when writing (default: 6 for gzip, 3 for zstd).
+    """
+    if shard_path.endswith(SHARD_EXTENSIONS['gzip']):
+        return gzip.open(shard_path, mode, compresslevel=compression_level or 6)
+    if shard_path.endswith(SHARD_EXTENSIONS['zstd']):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+        raw_file = open(shard_path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=compression_level or 3).stream_writer(raw_file)
+        return zstandard.ZstdDecompressor().stream_reader(raw_file)
+    return open(shard_path, mode)
+
+
+def merge_json_files_to_shards(source_folder_path, target_folder_path, shard_size=500, compression='gzip',
+                               compression_level=None):
+    '''
+    Streams the content of all JSON files in the source folder, one conversation at a time, into compressed
+    JSON Lines shards. Only a single conversation is held in memory at any time.
+
+    Each line of a shard is a JSON object: {"file_name": <source file name>, "content": <content of the file>}
+    The shard index (shards_index.json) lists the shards and the file names in each shard, in order.
+
+    :param source_folder_path: Path of the folder with the JSON files.
+    :param target_folder_path: Path of the folder to write the shards and the shard index to.
+    :param shard_size: Maximal number of conversations in each shard.
+    :param compression: 'gzip', 'zstd' or None (uncompressed).
+    :param compression_level: Compression level (default: 6 for gzip, 3 for zstd).
+    :returns: The shard index (dictionary).
+    '''
+    if compression not in SHARD_EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if shard_size < 1:
+        raise ValueError("shard_size must be a positive integer")
+
+    create_folder(target_folder_path)
+    json_files = sorted(file for file in os.listdir(source_folder_path) if file.endswith('.json'))
+
+    shards = []
+    shard_file = None
+    for ind, source_file_name in enumerate(json_files):
+        if ind % shard_size == 0:
+            if shard_file is not None:
+                shard_file.close()
+            shard_name = f'conversations_{len(shards):05d}{SHARD_EXTENSIONS[compression]}'
+            shard_file = open_shard(os.path.join(target_folder_path, shard_name), 'wb', compression_level)
+            shards.append({'shard': shard_name, 'file_names': []})
+
+        with open(os.path.join(source_folder_path, source_file_name), 'r') as source_file:
+            content = json.load(source_file)
+        line = json.dumps({'file_name': source_file_name, 'content': content}, separators=(',', ':'))
+        shard_file.write(line.encode('utf-8') + b'\n')
+        shards[-1]['file_names'].append(source_file_name)
+
+    if shard_file is not None:
+        shard_file.close()
+
+    shards_index = {
+        'compression': compression,
+        'shard_size': shard_size,
+        'num_of_conversations': len(json_files),
+        'shards': shards
+    }
+    with open(os.path.join(target_folder_path, SHARDS_INDEX_FILE), 'w') as index_file:
+        json.dump(shards_index, index_file)
+
+    print(f'Finished streaming content of {len(json_files)} files into {len(shards)} shards')
+    return shards_index
+
+
+if __name__ == '__main__':
+    # The single merged JSON file holds all conversations in memory: write it only when it is needed
+    write_merged_json = False
+
+    project_root = get_project_root()
+    source_folder_path = os.path.join(project_root, 'data', 'raw_files')
+    if write_merged_json:
+        target_file_path = os.path.join(project_root, 'data', 'processed', 'merged_conversations', 'all_conversations_merged.json')
+        merge_json_files(source_folder_path, target_file_path)
+
+    # Compressed JSON Lines shards (constant memory)
+    target_shards_path = os.path.join(project_root, 'data', 'processed', 'merged_conversations', 'shards')
+    merge_json_files_to_shards(source_folder_path, target_shards_path, shard_size=500, compression='gzip')
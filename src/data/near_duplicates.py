@@ -0,0 +1,207 @@
+"""
+This script contains a near-duplicate detector for conversations (MinHash signatures with LSH banding).
+Many recordings are essentially the same call (repeated IVR greetings, voicemail prompts, hold messages), so
+classification can run once per cluster of near-identical recordings and the labels are propagated to the cluster.
+1. Each conversation is represented by the set of its word shingles (word n-grams of the normalized text).
+2. A MinHash signature (num_perm minimal hash values) estimates the Jaccard similarity of two shingle sets.
+3. The signatures are split into bands; recordings that share an identical band are candidate pairs (LSH), so only
+   candidates are compared instead of all pairs of recordings.
+4. Recordings are clustered against representatives (leader clustering): in recording_id order, each recording
+   joins the most similar representative with an estimated similarity >= threshold, or becomes a representative.
+   Every recording is a near-duplicate of its representative (similarity is not transitive, so a chain of slowly
+   drifting recordings is not merged into one cluster).
+"""
+
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from src.data.conversation_index import ConversationIndex
+
+# Prime of the MinHash permutations ((a * x + b) mod prime), and the maximal hash value
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def get_shingles(text: str, shingle_size=5) -> set:
+    """
+    Returns the word shingles (word n-grams) of the text, lowercased and without punctuation.
+    Texts with fewer words than shingle_size have a single shingle (the entire text).
+    """
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < shingle_size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets, with num_perm random permutations (a * x + b) mod prime
+    of the 32-bit CRC of the shingles.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        random_state = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = random_state.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = random_state.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles) -> np.ndarray:
+        """
+        Returns the MinHash signature (uint64 array of length num_perm) of a set of shingles.
+        """
+        if not shingles:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1)
+
+
+def estimate_similarity(signature_1: np.ndarray, signature_2: np.ndarray) -> float:
+    """
+    Returns the estimated Jaccard similarity of two MinHash signatures.
+    """
+    return float(np.mean(signature_1 == signature_2))
+
+
+class MinHashLSHIndex:
+    """
+    LSH index over MinHash signatures: the signature is split into bands of rows_per_band values, and each band
+    is a bucket key. Recordings with a shared bucket are candidate near-duplicates.
+    With similarity s, the probability of a candidate pair is 1 - (1 - s^rows_per_band)^num_bands.
+    """
+
+    def __init__(self, num_perm=128, num_bands=16):
+        if num_perm % num_bands:
+            raise ValueError("num_perm must be divisible by num_bands")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.signatures = {}
+        self._buckets = [defaultdict(list) for _ in range(num_bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                for band in range(self.num_bands)]
+
+    def add(self, recording_id, signature: np.ndarray):
+        self.signatures[recording_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(recording_id)
+
+    def query(self, signature: np.ndarray, threshold=None) -> list:
+        """
+        Returns the recordings that share a bucket with the signature (and with an estimated similarity
+        >= threshold, if given).
+        """
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        if threshold is not None:
+            candidates = {candidate for candidate in candidates
+                          if estimate_similarity(signature, self.signatures[candidate]) >= threshold}
+        return sorted(candidates)
+
+    def buckets(self):
+        """
+        Yields the recordings of each bucket with more than one recording.
+        """
+        for band_buckets in self._buckets:
+            for recording_ids in band_buckets.values():
+                if len(recording_ids) > 1:
+                    yield recording_ids
+
+
+def build_lsh_index(df: pd.DataFrame, text_column='text', shingle_size=5, num_perm=128, num_bands=16,
+                    seed=1) -> MinHashLSHIndex:
+    """
+    Builds the LSH index of the conversations of an utterances DataFrame (the text of a conversation is its
+    utterances, ordered by time). Conversations without words are not indexed.
+    """
+    min_hasher = MinHasher(num_perm, seed)
+    lsh_index = MinHashLSHIndex(num_perm, num_bands)
+    conversation_index = ConversationIndex(df)
+    texts = conversation_index.df[text_column].astype(str).to_numpy()
+    for recording_id, start_row, end_row in conversation_index.offsets.itertuples(index=False):
+        shingles = get_shingles(' '.join(texts[start_row:end_row]), shingle_size)
+        if shingles:
+            lsh_index.add(recording_id, min_hasher.signature(shingles))
+    return lsh_index
+
+
+def cluster_near_duplicates(df: pd.DataFrame, threshold=0.8, text_column='text', shingle_size=5, num_perm=128,
+                            num_bands=16, seed=1) -> pd.Series:
+    """
+    Clusters near-identical conversations.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with columns 'recording_id', 'time' and the text column.
+        threshold (float): Minimal estimated Jaccard similarity of the shingles of two near-duplicates.
+        text_column (str): Column with the utterances text.
+        shingle_size (int): Number of words in a shingle.
+        num_perm (int): Length of the MinHash signatures.
+        num_bands (int): Number of LSH bands (num_perm must be divisible by it).
+        seed (int): Seed of the MinHash permutations.
+
+    Returns:
+        pd.Series: The cluster representative (the smallest recording_id of the cluster) of each recording_id
+                   (the index), with an estimated similarity >= threshold to every recording of its cluster.
+                   Recordings without near-duplicates are their own representatives.
+    """
+    lsh_index = build_lsh_index(df, text_column, shingle_size, num_perm, num_bands, seed)
+
+    # Leader clustering: each recording is compared only with the representatives that share an LSH bucket with it
+    # (an index of the representatives), so a bucket of many copies of the same call costs a comparison per
+    # recording, not per pair
+    representatives_index = MinHashLSHIndex(num_perm, num_bands)
+    representative_by_recording = {}
+    signatures = {str(recording_id): signature for recording_id, signature in lsh_index.signatures.items()}
+    for recording_id in sorted(signatures):
+        signature = signatures[recording_id]
+        candidates = representatives_index.query(signature, threshold=threshold)
+        if candidates:
+            # The most similar representative (the smallest recording_id among ties)
+            similarities = [estimate_similarity(signature, representatives_index.signatures[candidate])
+                            for candidate in candidates]
+            representative_by_recording[recording_id] = candidates[int(np.argmax(similarities))]
+        else:
+            representatives_index.add(recording_id, signature)
+            representative_by_recording[recording_id] = recording_id
+
+    recording_ids = sorted(str(recording_id) for recording_id in pd.unique(df['recording_id']))
+    representatives = [representative_by_recording.get(recording_id, recording_id) for recording_id in recording_ids]
+    return pd.Series(representatives, index=pd.Index(recording_ids, name='recording_id'), name='representative')
+
+
+def get_cluster_representatives(clusters: pd.Series) -> list:
+    """
+    Returns the representatives of the clusters (the recordings to classify).
+    """
+    return sorted(clusters.unique())
+
+
+def propagate_cluster_labels(labels_df: pd.DataFrame, clusters: pd.Series) -> pd.DataFrame:
+    """
+    Propagates the labels of the cluster representatives to all the recordings of their clusters.
+
+    Args:
+        labels_df (pd.DataFrame): Results of the representatives, with a 'recording_id' column (any other columns).
+        clusters (pd.Series): Output of cluster_near_duplicates.
+
+    Returns:
+        pd.DataFrame: The rows of each representative, repeated for every recording of its cluster (with its
+                      recording_id), and a 'representative' column.
+    """
+    members = clusters.reset_index()
+    labels_df = labels_df.rename(columns={'recording_id': 'representative'})
+    labels_df['representative'] = labels_df['representative'].astype(str)
+    propagated_df = members.merge(labels_df, on='representative', how='inner')
+    columns = ['recording_id'] + [column for column in propagated_df.columns if column != 'recording_id']
+    return propagated_df[columns]
@@ -0,0 +1,145 @@
+"""
+This script contains an online (incremental) care manager identifier for calls that are still being transcribed.
+1. Per-speaker running counters (single question marks, question marks, 'recorded' and 'this is' cues) are updated
+   as each utterance arrives, with constant work per utterance.
+2. After each utterance, the current best guess of the CM and a confidence score are available.
+3. Once the call is complete, the guess is the same as the batch functions: identify_care_manager
+   (method='identify_care_manager') or find_cm.find_care_manager (method='find_care_manager').
+"""
+
+import re
+
+from src.data.utterance_features import (SINGLE_QUESTION_MARK_PATTERN, RECORDED_WORD_PATTERN, THIS_IS_PATTERN,
+                                         QUESTION_MARKS_PATTERN)
+
+# Patterns (the same as in the batch functions)
+SINGLE_QUESTION_MARK_REGEX = re.compile(SINGLE_QUESTION_MARK_PATTERN)
+RECORDED_REGEX = re.compile(RECORDED_WORD_PATTERN, re.IGNORECASE)
+THIS_IS_REGEX = re.compile(THIS_IS_PATTERN, re.IGNORECASE)
+QUESTION_MARKS_REGEX = re.compile(QUESTION_MARKS_PATTERN)
+
+METHODS = ['identify_care_manager', 'find_care_manager']
+
+
+class OnlineCMIdentifier:
+    """
+    Incremental CM identifier of a single call.
+
+    Usage:
+        cm_identifier = OnlineCMIdentifier()
+        for speaker, text, time in utterances:
+            cm_identifier.add_utterance(speaker, text, time)
+            cm, confidence = cm_identifier.current_cm(), cm_identifier.confidence()
+    """
+
+    def __init__(self, method='identify_care_manager'):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method} (options: {METHODS})")
+        self.method = method
+        self.num_of_utterances = 0
+        self.single_qmarks = {}  # Speaker -> number of single question marks (identify_care_manager)
+        self.question_marks = {}  # Speaker -> number of question mark sequences (find_care_manager)
+        self.recorded_speakers = set()  # Speakers with 'recorded' in their utterances (identify_care_manager)
+        self.first_recorded = None  # (time, order, speaker) of the first utterance with the word 'recorded'
+        self.first_this_is = None  # (time, order, speaker) of the first utterance with 'this is'
+        # Speaker with the most question marks (ties: the first speaker name) of each counter
+        self._max_single_qmarks_speaker = None
+        self._max_question_marks_speaker = None
+
+    def add_utterance(self, speaker, text, time=None):
+        """
+        Updates the counters with a new utterance (constant work per utterance).
+
+        Args:
+            speaker (str): Speaker of the utterance.
+            text (str): Text of the utterance.
+            time (int): Starting time of the utterance (default: the order of arrival). Utterances may arrive out
+                        of order; the first 'recorded' / 'this is' speakers are determined by time.
+        """
+        text = text if isinstance(text, str) else ''
+        order = self.num_of_utterances
+        time = order if time is None else time
+        self.num_of_utterances += 1
+
+        self.single_qmarks[speaker] = (self.single_qmarks.get(speaker, 0) +
+                                       len(SINGLE_QUESTION_MARK_REGEX.findall(text.replace(' ', ''))))
+        self.question_marks[speaker] = (self.question_marks.get(speaker, 0) +
+                                        sum(1 for _ in QUESTION_MARKS_REGEX.finditer(text)))
+        self._max_single_qmarks_speaker = _update_max_speaker(self._max_single_qmarks_speaker, speaker,
+                                                              self.single_qmarks)
+        self._max_question_marks_speaker = _update_max_speaker(self._max_question_marks_speaker, speaker,
+                                                               self.question_marks)
+
+        if 'recorded' in text.lower():
+            self.recorded_speakers.add(speaker)
+        if RECORDED_REGEX.search(text) and (self.first_recorded is None or time < self.first_recorded[0]):
+            self.first_recorded = (time, order, speaker)
+        if THIS_IS_REGEX.search(text) and (self.first_this_is is None or time < self.first_this_is[0]):
+            self.first_this_is = (time, order, speaker)
+
+    def current_cm(self):
+        """
+        Returns the current best guess of the CM speaker (None if there is no guess).
+        """
+        if self.num_of_utterances == 0:
+            return None
+        if self.method == 'identify_care_manager':
+            return self._current_cm_identify_care_manager()
+        return self._current_cm_find_care_manager()
+
+    def _current_cm_identify_care_manager(self):
+        # Priority: 'recorded' (2) + max single question marks (1); ties: the first speaker name
+        max_qmarks = self.single_qmarks[self._max_single_qmarks_speaker]
+        return min(self.single_qmarks, key=lambda speaker: (-(2 * (speaker in self.recorded_speakers) +
+                                                              (self.single_qmarks[speaker] == max_qmarks)), speaker))
+
+    def _current_cm_find_care_manager(self):
+        # The rules of find_cm.choose_CM
+        recorded = self.first_recorded[2] if self.first_recorded else None
+        this_is = self.first_this_is[2] if self.first_this_is else None
+        most = self._max_question_marks_speaker
+        if recorded is None and most is None and this_is is None:
+            return None
+        if recorded is not None and recorded == most == this_is:
+            return recorded
+        if recorded is not None and recorded == this_is and recorded != most:
+            return recorded
+        if recorded is None:
+            return this_is
+        if this_is is None:
+            return most
+        if most is None:
+            return recorded
+        return None
+
+    def confidence(self) -> float:
+        """
+        Returns a confidence score (0-1) of the current guess: the share of the cues that point at the guessed
+        speaker. 'recorded' (and 'this is', for find_care_manager) count as whole cues, and the question marks
+        count as the share of the guessed speaker in the question marks of the call.
+        """
+        cm = self.current_cm()
+        if cm is None:
+            return 0.0
+        if self.method == 'identify_care_manager':
+            question_counts, cues = self.single_qmarks, [(0.6, cm in self.recorded_speakers)]
+        else:
+            question_counts = self.question_marks
+            cues = [(0.4, self.first_recorded is not None and self.first_recorded[2] == cm),
+                    (0.3, self.first_this_is is not None and self.first_this_is[2] == cm)]
+        question_weight = 1 - sum(weight for weight, _ in cues)
+        total_questions = sum(question_counts.values())
+        question_share = question_counts.get(cm, 0) / total_questions if total_questions else 0.0
+        return sum(weight for weight, is_cue in cues if is_cue) + question_weight * question_share
+
+
+def _update_max_speaker(max_speaker, speaker, counts):
+    """
+    Returns the speaker with the maximal count (ties: the first speaker name) after the count of 'speaker' grew
+    (counts only grow, so only the updated speaker can replace the current one).
+    """
+    if max_speaker is None or max_speaker == speaker:
+        return speaker
+    if (-counts[speaker], speaker) < (-counts[max_speaker], max_speaker):
+        return speaker
+    return max_speaker
@@ -0,0 +1,146 @@
+"""
+This script contains an optional local phrase index over the utterances text (SQLite with an FTS5 full-text index).
+Each utterance is stored with its recording_id, speaker, time and utterance_id, so phrase and prefix queries
+(e.g., which calls contain "recorded line", who said "this is" first in each call) return in milliseconds,
+instead of a full pass of pandas str.contains over the text column.
+
+Note: FTS5 matches whole tokens, case-insensitively (e.g., the phrase 'recorded' does not match 'unrecorded').
+Use search_prefix for token prefixes.
+"""
+
+import os
+import sqlite3
+
+import pandas as pd
+
+from src.utils.common import get_project_root
+
+# Name of the FTS5 table
+FTS_TABLE = 'utterances_fts'
+
+# Columns returned by the queries (in order)
+RESULT_COLUMNS = ['recording_id', 'speaker', 'time', 'utterance_id', 'text']
+
+
+class PhraseIndex:
+    """
+    SQLite FTS5 index over the utterances text, keyed by recording_id, speaker and time.
+    """
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Phrase index not found: {db_path}")
+        self.db_path = db_path
+        self._connection = sqlite3.connect(db_path)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, db_path, batch_size=50000):
+        """
+        Builds (or rebuilds) the index from an utterances DataFrame.
+
+        Args:
+            df (pd.DataFrame): Utterances DataFrame with 'recording_id', 'speaker', 'time', 'utterance_id' and 'text'.
+            db_path (str): Path of the SQLite database file.
+            batch_size (int): Number of utterances inserted per batch.
+
+        Returns:
+            PhraseIndex: The index, open for queries.
+        """
+        _check_fts5()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        connection = sqlite3.connect(db_path)
+        with connection:
+            connection.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+            connection.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                f'text, recording_id UNINDEXED, speaker UNINDEXED, time UNINDEXED, utterance_id UNINDEXED, '
+                f"tokenize='unicode61')"
+            )
+            rows = df[['text', 'recording_id', 'speaker', 'time', 'utterance_id']].astype(
+                {'text': str, 'recording_id': str, 'speaker': str, 'utterance_id': str})
+            for start in range(0, len(rows), batch_size):
+                batch = rows.iloc[start:start + batch_size]
+                connection.executemany(
+                    f'INSERT INTO {FTS_TABLE} (text, recording_id, speaker, time, utterance_id) VALUES (?, ?, ?, ?, ?)',
+                    zip(batch['text'], batch['recording_id'], batch['speaker'], batch['time'].tolist(),
+                        batch['utterance_id'])
+                )
+            connection.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        connection.close()
+        return cls(db_path)
+
+    def close(self):
+        self._connection.close()
+
+    def query(self, match_expression, recording_ids=None) -> pd.DataFrame:
+        """
+        Returns the utterances matching a raw FTS5 query expression, ordered by recording_id and time.
+
+        Args:
+            match_expression (str): FTS5 query (e.g., '"recorded line"', 'record*', '"this is" AND from').
+            recording_ids (list): If given, only utterances of these recordings are returned.
+        """
+        sql = f'SELECT {", ".join(RESULT_COLUMNS)} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?'
+        params = [match_expression]
+        if recording_ids is not None:
+            recording_ids = [str(recording_id) for recording_id in recording_ids]
+            sql += f' AND recording_id IN ({", ".join("?" * len(recording_ids))})'
+            params += recording_ids
+        sql += ' ORDER BY recording_id, time, rowid'
+        return pd.DataFrame(self._connection.execute(sql, params).fetchall(), columns=RESULT_COLUMNS)
+
+    def search_phrase(self, phrase, recording_ids=None) -> pd.DataFrame:
+        """
+        Returns the utterances containing the phrase (consecutive tokens, case-insensitive).
+        """
+        return self.query(_quote_phrase(phrase), recording_ids)
+
+    def search_prefix(self, prefix, recording_ids=None) -> pd.DataFrame:
+        """
+        Returns the utterances containing a token (or a phrase whose last token) starts with the prefix.
+        """
+        return self.query(_quote_phrase(prefix) + '*', recording_ids)
+
+    def recordings_with_phrase(self, phrase) -> list:
+        """
+        Returns the IDs of the recordings with at least one utterance containing the phrase.
+        """
+        sql = f'SELECT DISTINCT recording_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY recording_id'
+        return [row[0] for row in self._connection.execute(sql, [_quote_phrase(phrase)])]
+
+    def first_speaker_with_phrase(self, phrase) -> pd.Series:
+        """
+        Returns, for each recording that contains the phrase, the speaker of the first (earliest) utterance
+        containing it (a Series indexed by recording_id).
+        """
+        sql = (
+            f'SELECT recording_id, speaker FROM ('
+            f'SELECT recording_id, speaker, ROW_NUMBER() OVER (PARTITION BY recording_id ORDER BY time, rowid) AS rank '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?) WHERE rank = 1 ORDER BY recording_id'
+        )
+        rows = self._connection.execute(sql, [_quote_phrase(phrase)]).fetchall()
+        return pd.Series(dict(rows), name='speaker', dtype=object).rename_axis('recording_id')
+
+
+def _quote_phrase(phrase):
+    # FTS5 string: double quotes around the phrase, inner double quotes are doubled
+    return '"' + phrase.replace('"', '""') + '"'
+
+
+def _check_fts5():
+    try:
+        with sqlite3.connect(':memory:') as connection:
+            connection.execute('CREATE VIRTUAL TABLE fts5_check USING fts5(text)')
+    except sqlite3.OperationalError:
+        raise RuntimeError(f"The SQLite library (version {sqlite3.sqlite_version}) was built without FTS5 support")
+
+
+if __name__ == '__main__':
+    from src.utils.constants import load_raw_data_df
+
+    db_path = os.path.join(get_project_root(), 'data', 'processed', 'utterances_phrase_index.sqlite')
+    phrase_index = PhraseIndex.build(load_raw_data_df(columns=RESULT_COLUMNS), db_path)
+
+    recordings = phrase_index.recordings_with_phrase('recorded line')
+    print(f'{len(recordings)} calls contain "recorded line"')
+    print(phrase_index.first_speaker_with_phrase('this is').head())
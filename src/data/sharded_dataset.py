@@ -0,0 +1,238 @@
+"""
+This script contains a sharded dataset format for processing the utterances on several machines that share
+a filesystem.
+1. Recordings are assigned deterministically to N shards by a hash of the recording_id (CRC32 % N), so all
+   utterances of a recording are always in the same shard.
+2. Each shard is a self-describing Parquet file (shard-00003-of-00008.parquet) whose metadata holds the shard's
+   index, the number of shards and the hash function. A manifest (manifest.json) lists all shards; it is written
+   once, after all shards were written (without it, the manifest is derived from the shard files when reading).
+3. Any pipeline stage (a function that takes and returns an utterances DataFrame) can be run as
+   "process shard i of N": it reads shard i, runs the stage and writes shard i of the output dataset.
+
+Usage (one command per machine / process, then one command that writes the manifest of the output dataset):
+    python -m src.data.sharded_dataset --stage clean_data --input <dir> --output <dir> --shard 3
+    python -m src.data.sharded_dataset --write-manifest --output <dir>
+"""
+
+import argparse
+import json
+import os
+import uuid
+import zlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Key of the shard description in the Parquet file metadata
+SHARD_METADATA_KEY = b'laguna_shard'
+
+# Name of the manifest file (in the dataset folder)
+MANIFEST_FILE = 'manifest.json'
+
+# Hash function used to assign recordings to shards (recorded in the metadata of each shard)
+HASH_FUNCTION = 'crc32(recording_id) % num_shards'
+
+
+def get_shard_of_recordings(recording_ids, num_shards) -> np.ndarray:
+    """
+    Returns the shard index of each recording_id (CRC32 of the UTF-8 recording_id, modulo num_shards).
+    The assignment depends only on the recording_id and num_shards, so it is the same on every machine.
+    """
+    codes, unique_ids = pd.factorize(pd.Series(recording_ids, dtype=object))
+    unique_shards = np.array([zlib.crc32(str(recording_id).encode('utf-8')) % num_shards
+                              for recording_id in unique_ids], dtype=np.int64)
+    return unique_shards[codes] if len(unique_shards) else np.zeros(len(codes), dtype=np.int64)
+
+
+def get_shard_file_name(shard_index, num_shards) -> str:
+    return f'shard-{shard_index:05d}-of-{num_shards:05d}.parquet'
+
+
+def write_shard(df: pd.DataFrame, dataset_path, shard_index, num_shards, stage=None):
+    """
+    Writes a single shard file with its shard description in the file's metadata.
+    The file is written under a temporary name and renamed, so readers never see a partial shard.
+    """
+    os.makedirs(dataset_path, exist_ok=True)
+    shard_description = {
+        'shard_index': shard_index,
+        'num_shards': num_shards,
+        'hash_function': HASH_FUNCTION,
+        'num_of_utterances': len(df),
+        'num_of_recordings': int(df['recording_id'].nunique()) if 'recording_id' in df.columns else None,
+        'stage': stage
+    }
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SHARD_METADATA_KEY] = json.dumps(shard_description).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    shard_path = os.path.join(dataset_path, get_shard_file_name(shard_index, num_shards))
+    temp_path = f'{shard_path}.{uuid.uuid4().hex}.tmp'
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, shard_path)
+    return shard_path
+
+
+def read_shard_description(shard_path) -> dict:
+    """
+    Returns the shard description stored in the metadata of a shard file.
+    """
+    metadata = pq.read_schema(shard_path).metadata or {}
+    if SHARD_METADATA_KEY not in metadata:
+        raise ValueError(f"Not a shard file: {shard_path}")
+    return json.loads(metadata[SHARD_METADATA_KEY])
+
+
+def build_manifest(dataset_path) -> dict:
+    """
+    Builds the manifest of a dataset folder from the descriptions of its shard files.
+    """
+    shard_files = sorted(file for file in os.listdir(dataset_path)
+                         if file.startswith('shard-') and file.endswith('.parquet'))
+    shards = []
+    for shard_file in shard_files:
+        shard_path = os.path.join(dataset_path, shard_file)
+        shards.append({'file': shard_file, **read_shard_description(shard_path)})
+
+    num_shards = {shard['num_shards'] for shard in shards}
+    if len(num_shards) > 1:
+        raise ValueError(f"Shards with different numbers of shards in {dataset_path}: {sorted(num_shards)}")
+
+    manifest = {
+        'num_shards': num_shards.pop() if num_shards else 0,
+        'hash_function': HASH_FUNCTION,
+        'columns': pq.read_schema(os.path.join(dataset_path, shard_files[0])).names if shard_files else [],
+        'shards': shards
+    }
+    return manifest
+
+
+def write_manifest(dataset_path) -> dict:
+    """
+    Builds the manifest of a dataset folder and saves it. The manifest is written under a temporary name (unique
+    per writer) and renamed, so readers never see a partial manifest.
+    """
+    manifest = build_manifest(dataset_path)
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    temp_path = f'{manifest_path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    os.replace(temp_path, manifest_path)
+    return manifest
+
+
+def load_manifest(dataset_path) -> dict:
+    """
+    Loads the manifest of a dataset folder. If it was not written yet (e.g., while the shards of a stage are still
+    being processed), it is derived from the shard files.
+    """
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        if not os.path.isdir(dataset_path):
+            raise FileNotFoundError(f"File not found: {manifest_path}")
+        manifest = build_manifest(dataset_path)
+        if not manifest['shards']:
+            raise FileNotFoundError(f"File not found: {manifest_path} (and no shard files)")
+        return manifest
+    with open(manifest_path, 'r') as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_sharded_dataset(df: pd.DataFrame, dataset_path, num_shards) -> dict:
+    """
+    Splits the utterances DataFrame into num_shards shards by recording_id and writes the shards and the manifest.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame (with a 'recording_id' column).
+        dataset_path (str): Path of the dataset folder.
+        num_shards (int): Number of shards.
+
+    Returns:
+        dict: The manifest.
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be a positive integer")
+    shards = get_shard_of_recordings(df['recording_id'], num_shards)
+    for shard_index in range(num_shards):
+        write_shard(df[shards == shard_index], dataset_path, shard_index, num_shards)
+    return write_manifest(dataset_path)
+
+
+def read_shard(dataset_path, shard_index, columns=None) -> pd.DataFrame:
+    """
+    Reads shard i of the dataset (the number of shards is taken from the manifest).
+    """
+    num_shards = load_manifest(dataset_path)['num_shards']
+    if not 0 <= shard_index < num_shards:
+        raise IndexError(f"Shard {shard_index} out of range (num_shards={num_shards})")
+    shard_path = os.path.join(dataset_path, get_shard_file_name(shard_index, num_shards))
+    return pq.read_table(shard_path, columns=columns).to_pandas()
+
+
+def read_sharded_dataset(dataset_path, columns=None) -> pd.DataFrame:
+    """
+    Reads all shards of the dataset into a single DataFrame (in shard order).
+    """
+    manifest = load_manifest(dataset_path)
+    shards = [read_shard(dataset_path, shard_index, columns) for shard_index in range(manifest['num_shards'])]
+    return pd.concat(shards, ignore_index=True) if shards else pd.DataFrame(columns=columns)
+
+
+def run_on_shard(stage, input_path, output_path, shard_index, stage_name=None, **stage_kwargs) -> str:
+    """
+    Runs a pipeline stage on shard i of N: reads shard i of the input dataset, runs the stage on it and writes
+    the result as shard i of the output dataset. Shards of the same stage can run concurrently (on several
+    machines); the manifest of the output dataset is not written here, but once, by write_manifest, after all the
+    shards were processed.
+
+    Args:
+        stage (function): Function that receives an utterances DataFrame (and stage_kwargs) and returns a DataFrame.
+        input_path (str): Path of the input dataset folder.
+        output_path (str): Path of the output dataset folder.
+        shard_index (int): Index of the shard to process.
+        stage_name (str): Name of the stage, stored in the metadata of the output shard.
+
+    Returns:
+        str: Path of the output shard file.
+    """
+    num_shards = load_manifest(input_path)['num_shards']
+    df = read_shard(input_path, shard_index)
+    result_df = stage(df, **stage_kwargs)
+    shard_path = write_shard(result_df, output_path, shard_index, num_shards,
+                             stage=stage_name or getattr(stage, '__name__', None))
+    return shard_path
+
+
+def _get_stages():
+    from src.utils.constants import cities_file
+    from src.data.data_pipeline_functions import clean_data, identify_care_manager
+    return {
+        'identify_care_manager': (identify_care_manager, {}),
+        'clean_data': (clean_data, {'cities_file': cities_file, 'cities_threshold': 3})
+    }
+
+
+if __name__ == '__main__':
+    stages = _get_stages()
+    parser = argparse.ArgumentParser(description='Run a pipeline stage on a single shard of a sharded dataset.')
+    parser.add_argument('--stage', choices=sorted(stages))
+    parser.add_argument('--input', help='Path of the input dataset folder')
+    parser.add_argument('--output', required=True, help='Path of the output dataset folder')
+    parser.add_argument('--shard', type=int, help='Index of the shard to process')
+    parser.add_argument('--write-manifest', action='store_true',
+                        help='Write the manifest of the output dataset (after all the shards were processed)')
+    args = parser.parse_args()
+
+    if args.write_manifest:
+        manifest = write_manifest(args.output)
+        print(f"Manifest of {args.output}: {len(manifest['shards'])}/{manifest['num_shards']} shards")
+    else:
+        if args.stage is None or args.input is None or args.shard is None:
+            parser.error('--stage, --input and --shard are required to process a shard')
+        stage_function, stage_kwargs = stages[args.stage]
+        output_shard = run_on_shard(stage_function, args.input, args.output, args.shard, stage_name=args.stage,
+                                    **stage_kwargs)
+        print(f'Finished stage {args.stage} on shard {args.shard}: {output_shard}')
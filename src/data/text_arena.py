@@ -0,0 +1,144 @@
+"""
+This script contains a text arena for the utterances text.
+All utterances are stored in one contiguous UTF-8 buffer, ordered by (recording_id, time), with an int64 offsets
+array (the utterance i is buffer[offsets[i]:offsets[i + 1]], followed by a separator).
+1. An utterance, a span of consecutive utterances or an entire conversation is a single slice of the buffer
+   (a memoryview without copying, or a str), without a Python object per utterance.
+2. The arena can be saved to disk and memory-mapped, so several worker processes share the same corpus in memory.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data.conversation_index import ConversationIndex
+
+# Files of a saved arena
+TEXT_FILE = 'text.bin'
+OFFSETS_FILE = 'offsets.npy'
+RECORDINGS_FILE = 'recordings.npy'
+META_FILE = 'meta.json'
+
+
+class TextArena:
+    """
+    Contiguous UTF-8 buffer of utterances with int64 offsets.
+
+    Attributes:
+        offsets (np.ndarray): int64 array of length (num_of_utterances + 1) with the start of each utterance.
+        recording_ids (list): IDs of the recordings in the arena, in order.
+        recording_rows (np.ndarray): int64 array (num_of_recordings x 2) with the (start_row, end_row) of each
+                                     recording's utterances.
+    """
+
+    def __init__(self, buffer, offsets, recording_ids, recording_rows, sep=' '):
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self.offsets = offsets
+        self.recording_ids = list(recording_ids)
+        self.recording_rows = recording_rows
+        self.sep = sep
+        self._sep_length = len(sep.encode('utf-8'))
+        self._recordings = {recording_id: ind for ind, recording_id in enumerate(self.recording_ids)}
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, text_column='text', sep=' '):
+        """
+        Builds the arena from an utterances DataFrame.
+
+        Args:
+            df (pd.DataFrame): Utterances DataFrame with 'recording_id', 'time' and the text column
+                               (or a ConversationIndex over it).
+            text_column (str): Column with the text to store (e.g., 'text' or a 'Speaker A: text' column).
+            sep (str): Separator stored after each utterance (appears between utterances of a span).
+        """
+        conversation_index = df if isinstance(df, ConversationIndex) else ConversationIndex(df)
+        encoded_sep = sep.encode('utf-8')
+        encoded_texts = [text.encode('utf-8') + encoded_sep for text in conversation_index.df[text_column]]
+
+        lengths = np.fromiter(map(len, encoded_texts), dtype=np.int64, count=len(encoded_texts))
+        offsets = np.zeros(len(encoded_texts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        buffer = b''.join(encoded_texts)
+
+        recording_rows = conversation_index.offsets[['start_row', 'end_row']].to_numpy(dtype=np.int64)
+        return cls(buffer, offsets, conversation_index.offsets['recording_id'].tolist(), recording_rows, sep)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._view)
+
+    def get_span_bytes(self, start_row, end_row) -> memoryview:
+        """
+        Returns the utterances start_row, ..., end_row - 1 (joined by the separator) as a memoryview (no copy).
+        """
+        if not 0 <= start_row < end_row <= len(self):
+            raise IndexError(f"Invalid span: [{start_row}, {end_row})")
+        return self._view[self.offsets[start_row]:self.offsets[end_row] - self._sep_length]
+
+    def get_span(self, start_row, end_row) -> str:
+        """
+        Returns the utterances start_row, ..., end_row - 1 joined by the separator.
+        """
+        return str(self.get_span_bytes(start_row, end_row), 'utf-8')
+
+    def get_utterance_bytes(self, row) -> memoryview:
+        return self.get_span_bytes(row, row + 1)
+
+    def get_utterance(self, row) -> str:
+        return self.get_span(row, row + 1)
+
+    def get_conversation_rows(self, recording_id) -> tuple:
+        """
+        Returns the (start_row, end_row) of the recording's utterances in the arena.
+        """
+        start_row, end_row = self.recording_rows[self._recordings[recording_id]]
+        return int(start_row), int(end_row)
+
+    def get_conversation_bytes(self, recording_id) -> memoryview:
+        return self.get_span_bytes(*self.get_conversation_rows(recording_id))
+
+    def get_conversation(self, recording_id) -> str:
+        """
+        Returns the entire text of the recording (its utterances, ordered by time, joined by the separator).
+        """
+        return self.get_span(*self.get_conversation_rows(recording_id))
+
+    def save(self, folder_path):
+        """
+        Saves the arena to a folder (raw text buffer, offsets and recording ranges).
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, TEXT_FILE), 'wb') as text_file:
+            text_file.write(self._view)
+        np.save(os.path.join(folder_path, OFFSETS_FILE), np.asarray(self.offsets))
+        np.save(os.path.join(folder_path, RECORDINGS_FILE), np.asarray(self.recording_rows))
+        with open(os.path.join(folder_path, META_FILE), 'w') as meta_file:
+            json.dump({'sep': self.sep, 'recording_ids': self.recording_ids}, meta_file)
+
+    @classmethod
+    def load(cls, folder_path, mmap=True):
+        """
+        Loads a saved arena. With mmap=True, the text buffer and the offsets are memory-mapped (read-only),
+        so processes that load the same arena share its memory.
+        """
+        if not os.path.exists(os.path.join(folder_path, META_FILE)):
+            raise FileNotFoundError(f"Text arena not found: {folder_path}")
+        with open(os.path.join(folder_path, META_FILE), 'r') as meta_file:
+            meta = json.load(meta_file)
+
+        text_path = os.path.join(folder_path, TEXT_FILE)
+        mmap_mode = 'r' if mmap else None
+        if mmap and os.path.getsize(text_path) > 0:
+            buffer = np.memmap(text_path, dtype=np.uint8, mode='r')
+        else:
+            with open(text_path, 'rb') as text_file:
+                buffer = text_file.read()
+        offsets = np.load(os.path.join(folder_path, OFFSETS_FILE), mmap_mode=mmap_mode)
+        recording_rows = np.load(os.path.join(folder_path, RECORDINGS_FILE), mmap_mode=mmap_mode)
+        return cls(buffer, offsets, meta['recording_ids'], recording_rows, meta['sep'])
@@ -0,0 +1,151 @@
+"""
+This script contains functions that read conversation transcripts (one JSON file per conversation) into a
+Pandas DataFrame of utterances.
+1. Each transcript is unpacked directly into column arrays (no intermediate dictionary per utterance).
+2. Files can be parsed in parallel over a thread pool or a process pool.
+3. The column arrays of all files are concatenated once into the utterances DataFrame.
+4. The duration of all utterances is computed in a single vectorized step over the entire corpus.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from src.utils.common import load_json_data
+
+# Columns of the utterances DataFrame (in order)
+UTTERANCE_COLUMNS = ['file_name', 'recording_id', 'member_id', 'utterance_id', 'speaker', 'time', 'text', 'duration']
+
+
+def parse_transcript(file: str, content: dict) -> dict:
+    """
+    Unpacks the data of a single conversation into column arrays.
+
+    Args:
+        file (str): File name in the format '[member_id]_[recording_id]'.
+        content (dict): A dictionary with key: transcript, value: list of dictionaries containing the data of all
+                        utterances of the transcript.
+
+    Returns:
+        dict: Column name (key) and list / NumPy array with the values of all utterances in the conversation (value).
+              The 'duration' column is added later for the entire corpus (see add_utterance_durations).
+    """
+    member_id, recording_id = file.split('_')
+    recording_id = recording_id.split('.')[0]
+    utterances = content['transcript']
+    num_of_utterances = len(utterances)
+
+    return {
+        'file_name': [file] * num_of_utterances,
+        'recording_id': [recording_id] * num_of_utterances,
+        'member_id': [member_id] * num_of_utterances,
+        'utterance_id': [utterance['id'] for utterance in utterances],
+        'speaker': [utterance['speaker'][-1] for utterance in utterances],
+        'time': np.array([utterance['time'] for utterance in utterances]),
+        'text': [utterance['text'] for utterance in utterances]
+    }
+
+
+def read_transcript_file(folder_path: str, filename: str) -> dict:
+    """
+    Loads a single transcript JSON file and unpacks it into column arrays (see parse_transcript).
+    """
+    content = load_json_data(os.path.join(folder_path, filename))
+    return parse_transcript(filename.split('.')[0], content)
+
+
+def columns_to_dataframe(parsed_transcripts: list) -> pd.DataFrame:
+    """
+    Concatenates the column arrays of several conversations into a single utterances DataFrame.
+
+    Args:
+        parsed_transcripts (list): List of dictionaries returned by parse_transcript.
+
+    Returns:
+        pd.DataFrame: DataFrame with one row per utterance and the columns in UTTERANCE_COLUMNS.
+    """
+    # Conversations without utterances would turn the integer arrays into floats
+    parsed_transcripts = [columns for columns in parsed_transcripts if len(columns['time'])]
+    data = {}
+    for column in UTTERANCE_COLUMNS[:-1]:
+        arrays = [columns[column] for columns in parsed_transcripts]
+        if column == 'time':
+            data[column] = np.concatenate(arrays) if arrays else np.array([], dtype=np.int64)
+        else:
+            data[column] = list(chain.from_iterable(arrays))
+    df = pd.DataFrame(data, columns=UTTERANCE_COLUMNS[:-1])
+    return add_utterance_durations(df)
+
+
+def add_utterance_durations(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the 'duration' column to the utterances DataFrame, for all conversations at once.
+    The utterances are ordered by (recording_id, time), and the duration of each utterance is the difference
+    between its starting time and the starting time of the next utterance in the same recording.
+    The end time of the last utterance of a recording is unknown, so its duration is 0.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with 'recording_id' and 'time' columns.
+
+    Returns:
+        pd.DataFrame: The same DataFrame (modified in place) with the 'duration' column.
+    """
+    times = df['time'].to_numpy()
+    recording_codes = pd.factorize(df['recording_id'])[0]
+    order = np.lexsort((times, recording_codes))  # Stable: utterances with equal times keep their order
+
+    sorted_times = times[order]
+    sorted_codes = recording_codes[order]
+    sorted_durations = np.zeros(len(df), dtype=sorted_times.dtype)
+    same_recording = sorted_codes[1:] == sorted_codes[:-1]
+    sorted_durations[:-1] = np.where(same_recording, sorted_times[1:] - sorted_times[:-1], 0)
+
+    durations = np.empty_like(sorted_durations)
+    durations[order] = sorted_durations
+    df['duration'] = durations
+    return df
+
+
+def read_transcripts(folder_path: str, filenames=None, n_jobs=1, use_threads=False, verbose=False) -> pd.DataFrame:
+    """
+    Reads transcript JSON files into a utterances DataFrame, optionally in parallel.
+
+    Args:
+        folder_path (str): Path of the folder containing the json files.
+        filenames (list): Names of the files to read (default: all files in the folder).
+        n_jobs (int): Number of workers. 1 parses the files sequentially, None uses all CPU cores.
+        use_threads (bool): If True, uses a thread pool instead of a process pool.
+        verbose (bool): If True, prints the ingestion throughput (files/sec and utterances/sec).
+
+    Returns:
+        pd.DataFrame: DataFrame with one row per utterance, ordered as the files in 'filenames'.
+    """
+    if filenames is None:
+        filenames = os.listdir(folder_path)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    start_time = time.perf_counter()
+    read_file = partial(read_transcript_file, folder_path)
+    if n_jobs == 1 or len(filenames) <= 1:
+        parsed_transcripts = [read_file(filename) for filename in filenames]
+    else:
+        pool_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+        chunksize = max(1, len(filenames) // (n_jobs * 4))
+        with pool_class(max_workers=n_jobs) as pool:
+            parsed_transcripts = list(pool.map(read_file, filenames, chunksize=chunksize))
+
+    df = columns_to_dataframe(parsed_transcripts)
+    elapsed = time.perf_counter() - start_time
+
+    if verbose:
+        elapsed = max(elapsed, 1e-9)
+        print(f'Ingested {len(filenames)} files ({len(df)} utterances) in {elapsed:.2f} seconds: '
+              f'{len(filenames) / elapsed:.1f} files/sec, {len(df) / elapsed:.1f} utterances/sec')
+
+    return df
@@ -0,0 +1,215 @@
+"""
+This script contains the per-utterance feature store: cheap text signals of each utterance, keyed by utterance_id.
+1. The features are computed once, with vectorized string operations over the entire text column
+   (question mark counts, 'recorded' / 'this is' flags, word counts and average word duration).
+2. The store is a folder of Parquet part files. New utterances are appended as a new part file; an utterance that
+   is added again (e.g., its duration changed when the next utterance of the call arrived) replaces the old row.
+   Each row keeps a hash of its inputs (text and duration), so rows of utterances that changed are recomputed.
+   The store is compacted (rewritten as one part file without the replaced rows) after the parallel stages, and
+   whenever it has more than MAX_PART_FILES part files.
+3. Consumers (identify_care_manager, find_cm, corpus_statistics, avg_word_duration) get the features of their
+   utterances with get_utterance_features, from the store if a store path is given (missing and changed
+   utterances are computed and appended), or computed in memory otherwise.
+"""
+
+import multiprocessing
+import os
+import string
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Feature columns (in order)
+FEATURE_COLUMNS = [
+    'num_of_single_qmarks',  # '?' not followed by another '?', ignoring spaces (identify_care_manager)
+    'num_of_question_marks',  # Sequences of question marks (find_cm)
+    'has_recorded',  # 'recorded' anywhere in the text, case-insensitive (identify_care_manager)
+    'has_recorded_word',  # The word 'recorded', case-insensitive (find_cm)
+    'has_this_is',  # 'this is', case-insensitive (find_cm)
+    'num_of_words',  # Number of whitespace-separated words
+    'num_of_words_without_punctuation',  # Number of words after removing the punctuation
+    'duration',  # Duration of the utterance
+    'avg_word_duration'  # duration / num_of_words_without_punctuation (0 without words)
+]
+
+SINGLE_QUESTION_MARK_PATTERN = r'\?(?!\?)'
+QUESTION_MARKS_PATTERN = r'\?(\s*\?)+|\?'
+RECORDED_WORD_PATTERN = r'\brecorded\b'
+THIS_IS_PATTERN = r'this is'
+PUNCTUATION_PATTERN = '[' + ''.join('\\' + char for char in string.punctuation) + ']'
+
+# Number of part files above which the store is compacted
+MAX_PART_FILES = 8
+
+# Column of the store with the hash of the inputs (text, duration) the features of the row were computed from
+INPUT_HASH_COLUMN = 'input_hash'
+
+
+def compute_utterance_features(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    Computes the features of the utterances.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame with a 'text' column ('duration' is optional: without it, the
+                           duration features are NaN; 'utterance_id', if present, is used as the index of the result).
+        columns (list): Feature columns to compute (default: FEATURE_COLUMNS).
+
+    Returns:
+        pd.DataFrame: The requested feature columns, one row per utterance (same order as df).
+    """
+    columns = FEATURE_COLUMNS if columns is None else list(columns)
+    unknown_columns = set(columns) - set(FEATURE_COLUMNS)
+    if unknown_columns:
+        raise ValueError(f"Unknown feature columns: {sorted(unknown_columns)} (options: {FEATURE_COLUMNS})")
+    text = df['text'].fillna('').astype(str)
+    duration = df['duration'].to_numpy() if 'duration' in df.columns else np.full(len(df), np.nan)
+
+    features = pd.DataFrame(index=df.index)
+    if 'num_of_single_qmarks' in columns:
+        features['num_of_single_qmarks'] = text.str.replace(' ', '', regex=False).str.count(
+            SINGLE_QUESTION_MARK_PATTERN).astype(np.int64)
+    if 'num_of_question_marks' in columns:
+        features['num_of_question_marks'] = text.str.count(QUESTION_MARKS_PATTERN).astype(np.int64)
+    if 'has_recorded' in columns:
+        features['has_recorded'] = text.str.lower().str.contains('recorded', regex=False).astype(bool)
+    if 'has_recorded_word' in columns:
+        features['has_recorded_word'] = text.str.contains(RECORDED_WORD_PATTERN, case=False, regex=True).astype(bool)
+    if 'has_this_is' in columns:
+        features['has_this_is'] = text.str.contains(THIS_IS_PATTERN, case=False, regex=True).astype(bool)
+    if 'num_of_words' in columns:
+        features['num_of_words'] = text.str.split().str.len().astype(np.int64)
+    if 'num_of_words_without_punctuation' in columns or 'avg_word_duration' in columns:
+        num_of_words = text.str.replace(PUNCTUATION_PATTERN, '', regex=True).str.split().str.len().to_numpy(
+            dtype=np.int64)
+        features['num_of_words_without_punctuation'] = num_of_words
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features['avg_word_duration'] = np.where(num_of_words > 0, duration / np.maximum(num_of_words, 1), 0)
+    features['duration'] = duration
+
+    if 'utterance_id' in df.columns:
+        features.index = pd.Index(df['utterance_id'].astype(str).to_numpy(), name='utterance_id')
+    return features[columns]
+
+
+def append_to_feature_store(features: pd.DataFrame, store_path, part_name=None):
+    """
+    Appends features (indexed by utterance_id) to the store as a new part file.
+    Part files are named by their creation time (default part_name), so later parts replace the rows of earlier ones.
+    """
+    if features.empty:
+        return None
+    os.makedirs(store_path, exist_ok=True)
+    if part_name is None:
+        part_name = f'part-{time.time_ns():020d}-{uuid.uuid4().hex}'
+    part_path = os.path.join(store_path, part_name + '.parquet')
+    temp_path = f'{part_path}.{uuid.uuid4().hex}.tmp'
+    features.reset_index().to_parquet(temp_path, index=False)
+    os.replace(temp_path, part_path)
+    return part_path
+
+
+def load_feature_store(store_path, utterance_ids=None, columns=None) -> pd.DataFrame:
+    """
+    Loads the features of the store (the latest row of each utterance_id).
+
+    Args:
+        store_path (str): Path of the store folder.
+        utterance_ids (list): If given, only the features of these utterances are returned.
+        columns (list): Feature columns to load (default: all).
+
+    Returns:
+        pd.DataFrame: Features indexed by utterance_id.
+    """
+    part_files = _get_part_files(store_path)
+    if not part_files:
+        return pd.DataFrame(columns=columns or FEATURE_COLUMNS, index=pd.Index([], name='utterance_id'))
+    read_columns = None if columns is None else ['utterance_id'] + list(columns)
+    filters = None if utterance_ids is None else [('utterance_id', 'in', [str(utterance_id)
+                                                                          for utterance_id in utterance_ids])]
+    parts = [pd.read_parquet(part_file, columns=read_columns, filters=filters) for part_file in part_files]
+    features = pd.concat(parts, ignore_index=True).drop_duplicates('utterance_id', keep='last')
+    return features.set_index('utterance_id')
+
+
+def compact_feature_store(store_path, min_part_files=2):
+    """
+    Rewrites the part files of the store as a single part file, with the latest row of each utterance_id, if the
+    store has at least min_part_files part files. The compacted part is named after the latest part it replaces,
+    so parts appended in the meantime still replace its rows.
+    """
+    part_files = _get_part_files(store_path)
+    if len(part_files) < max(min_part_files, 2):
+        return
+    features = pd.concat([pd.read_parquet(part_file) for part_file in part_files], ignore_index=True)
+    features = features.drop_duplicates('utterance_id', keep='last').set_index('utterance_id')
+    last_part_name = os.path.splitext(os.path.basename(part_files[-1]))[0].removesuffix('-compacted')
+    compacted_part_path = append_to_feature_store(features, store_path, part_name=last_part_name + '-compacted')
+    for part_file in part_files:
+        if part_file != compacted_part_path:
+            os.remove(part_file)
+
+
+def get_input_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Returns a hash (uint64) of the inputs of the features (text and duration) of each utterance.
+    """
+    inputs = pd.DataFrame({
+        'text': df['text'].fillna('').astype(str).to_numpy(),
+        'duration': df['duration'].to_numpy(dtype=float) if 'duration' in df.columns else np.full(len(df), np.nan)
+    })
+    return pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+
+
+def update_feature_store(df: pd.DataFrame, store_path) -> pd.DataFrame:
+    """
+    Computes the features of new utterances (or utterances that changed) and appends them to the store, with the
+    hash of their inputs. In the main process, the store is compacted when it has more than MAX_PART_FILES part
+    files (worker processes of the parallel stages only append; the stages compact the store when they finish).
+    """
+    features = compute_utterance_features(df)
+    append_to_feature_store(features.assign(**{INPUT_HASH_COLUMN: get_input_hashes(df)}), store_path)
+    if multiprocessing.parent_process() is None:
+        compact_feature_store(store_path, min_part_files=MAX_PART_FILES + 1)
+    return features
+
+
+def get_utterance_features(df: pd.DataFrame, feature_store_path=None, columns=None) -> pd.DataFrame:
+    """
+    Returns the features of the utterances of df, aligned with its rows (same order and index).
+    With a store path, the features are read from the store. Utterances that are not in the store, or whose text or
+    duration changed since they were stored, are computed (all the features) and appended to it. Without a store
+    path (or without an 'utterance_id' column), only the requested columns (default: FEATURE_COLUMNS) are computed.
+    """
+    columns = FEATURE_COLUMNS if columns is None else list(columns)
+    if feature_store_path is None or 'utterance_id' not in df.columns:
+        features = compute_utterance_features(df, columns)
+        features.index = df.index
+        return features
+
+    utterance_ids = df['utterance_id'].astype(str).to_numpy()
+    input_hashes = get_input_hashes(df)
+    stored_features = load_feature_store(feature_store_path, utterance_ids=pd.unique(utterance_ids),
+                                         columns=columns + [INPUT_HASH_COLUMN])
+    stored_rows = stored_features.index.get_indexer(utterance_ids)
+    is_stale = stored_rows == -1
+    stored_hashes = stored_features[INPUT_HASH_COLUMN].to_numpy()
+    is_stale[~is_stale] = stored_hashes[stored_rows[~is_stale]].astype(np.uint64) != input_hashes[~is_stale]
+
+    stored_features = stored_features[columns]
+    if is_stale.any():
+        new_features = update_feature_store(df[is_stale], feature_store_path)[columns]
+        new_features = new_features[~new_features.index.duplicated(keep='last')]
+        stored_features = stored_features.drop(index=new_features.index, errors='ignore')
+        stored_features = pd.concat([stored_features, new_features]) if len(stored_features) else new_features
+    features = stored_features.reindex(utterance_ids)[columns]
+    features.index = df.index
+    return features
+
+
+def _get_part_files(store_path):
+    if not os.path.exists(store_path):
+        return []
+    return [os.path.join(store_path, file) for file in sorted(os.listdir(store_path))
+            if file.startswith('part-') and file.endswith('.parquet')]
@@ -0,0 +1,160 @@
+"""
+This script contains functions for a columnar (Parquet) store of the utterances table.
+1. The utterances DataFrame is written as a Parquet dataset, partitioned by member_id / recording_id
+   (one directory per partition value).
+2. The reader loads only the requested columns (column projection) and only the partitions of the requested
+   recordings / members (predicate pushdown), instead of parsing the entire CSV file.
+"""
+
+import json
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Default partitioning of the store (directory levels, in order)
+PARTITION_COLS = ['member_id', 'recording_id']
+
+# Store description file (files starting with '_' are ignored by the Parquet dataset discovery)
+STORE_INFO_FILE = '_store_info.json'
+
+
+def write_utterance_store(df: pd.DataFrame, store_path: str, partition_cols=None, mode='overwrite'):
+    """
+    Writes the utterances DataFrame into a partitioned Parquet store.
+
+    Args:
+        df (pd.DataFrame): Utterances DataFrame (must include the partition columns).
+        store_path (str): Path of the store's root folder.
+        partition_cols (list): Columns to partition by (default: PARTITION_COLS).
+        mode (str): 'overwrite' - partitions that exist in the store and appear in 'df' are replaced.
+                    'append' - the rows of 'df' are added as new files next to the existing ones.
+                    In both modes, partitions that do not appear in 'df' are kept as they are.
+    """
+    if mode not in ('overwrite', 'append'):
+        raise ValueError(f"Unknown mode: {mode}")
+    if partition_cols is None:
+        partition_cols = _get_store_partition_cols(store_path)
+
+    df = df.copy()
+    for column in partition_cols:
+        df[column] = df[column].astype(str)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in partition_cols]), flavor='hive')
+
+    ds.write_dataset(
+        table,
+        store_path,
+        format='parquet',
+        partitioning=partitioning,
+        basename_template='part-{i}.parquet' if mode == 'overwrite' else f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+        max_partitions=max(1, len(df)),
+        existing_data_behavior='delete_matching' if mode == 'overwrite' else 'overwrite_or_ignore'
+    )
+
+    store_info = {'partition_cols': list(partition_cols), 'columns': list(df.columns)}
+    with open(os.path.join(store_path, STORE_INFO_FILE), 'w') as info_file:
+        json.dump(store_info, info_file, indent=4)
+
+
+def read_utterance_store(store_path: str, columns=None, recording_ids=None, member_ids=None) -> pd.DataFrame:
+    """
+    Reads utterances from the Parquet store.
+
+    Args:
+        store_path (str): Path of the store's root folder.
+        columns (list): Columns to load (default: all columns).
+        recording_ids (list): If given, loads only the utterances of these recordings.
+        member_ids (list): If given, loads only the utterances of these members.
+
+    Returns:
+        pd.DataFrame: The utterances DataFrame with the requested columns (in the requested order).
+    """
+    if not os.path.exists(store_path):
+        raise FileNotFoundError(f"Store not found: {store_path}")
+
+    partition_cols = _get_store_partition_cols(store_path)
+    partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in partition_cols]), flavor='hive')
+    dataset = ds.dataset(store_path, format='parquet', partitioning=partitioning)
+
+    filter_expression = None
+    for column, values in (('recording_id', recording_ids), ('member_id', member_ids)):
+        if values is None:
+            continue
+        condition = ds.field(column).isin([str(value) for value in values])
+        filter_expression = condition if filter_expression is None else filter_expression & condition
+
+    if columns is None:
+        columns = _get_store_columns(store_path) or dataset.schema.names
+    table = dataset.to_table(columns=list(columns), filter=filter_expression)
+
+    df = table.to_pandas()
+    for column in partition_cols:
+        if column in df.columns:
+            df[column] = df[column].astype(str)
+    return df
+
+
+def delete_recordings_from_utterance_store(store_path: str, recording_ids):
+    """
+    Deletes all utterances of the given recordings from the Parquet store.
+    Files that hold only utterances of these recordings are removed, other files are rewritten without them.
+
+    Args:
+        store_path (str): Path of the store's root folder.
+        recording_ids (list): IDs of the recordings to delete.
+    """
+    if not os.path.exists(store_path):
+        return
+    recording_ids = [str(recording_id) for recording_id in recording_ids]
+    if not recording_ids:
+        return
+
+    partition_cols = _get_store_partition_cols(store_path)
+    partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in partition_cols]), flavor='hive')
+    dataset = ds.dataset(store_path, format='parquet', partitioning=partitioning)
+    to_delete = ds.field('recording_id').isin(recording_ids)
+
+    for fragment in dataset.get_fragments(filter=to_delete):
+        if 'recording_id' in partition_cols:
+            os.remove(fragment.path)
+            continue
+        # The file may hold utterances of other recordings as well
+        table = fragment.to_table(schema=fragment.physical_schema)
+        kept = table.filter(~pc.is_in(table['recording_id'], value_set=pa.array(recording_ids)))
+        if kept.num_rows == len(table):
+            continue
+        if kept.num_rows == 0:
+            os.remove(fragment.path)
+        else:
+            pq.write_table(kept, fragment.path)
+
+
+def csv_to_utterance_store(csv_path: str, store_path: str, partition_cols=None):
+    """
+    Converts the utterances CSV file (e.g., all_raw_utterances_df.csv) into a Parquet store.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"File not found: {csv_path}")
+    df = pd.read_csv(csv_path, dtype={'recording_id': str, 'member_id': str, 'speaker': str})
+    write_utterance_store(df, store_path, partition_cols=partition_cols)
+
+
+def _read_store_info(store_path):
+    info_path = os.path.join(store_path, STORE_INFO_FILE)
+    if not os.path.exists(info_path):
+        return {}
+    with open(info_path, 'r') as info_file:
+        return json.load(info_file)
+
+
+def _get_store_partition_cols(store_path):
+    return _read_store_info(store_path).get('partition_cols', PARTITION_COLS)
+
+
+def _get_store_columns(store_path):
+    return _read_store_info(store_path).get('columns')
@@ -12,12 +12,16 @@ import nltk
 from flair.embeddings import WordEmbeddings
 from flair.data import Sentence
 import torch
-from nltk import pos_tag, WordNetLemmatizer
+from nltk import pos_tag
 from nltk.corpus import stopwords, wordnet
 from src.features.tf_idf_by_topic import top_10_words_per_topic
 from src.data.generate_corpus_statistics_df import df
 from src.utils.common import get_project_root
-import json
+from src.utils.lemma_cache import get_lemma_cache
+from src.utils.batch_preprocessing import lemmatize_texts
+from src.utils.constants import lemma_cache_file
+import os
+from src.data.conversations_reader import iter_conversations
 
 # Initialize embeddings
 glove_embedding = WordEmbeddings('glove')
@@ -70,10 +74,11 @@ def get_wordnet_pos(treebank_tag):
     else:
         return wordnet.NOUN
 
-def lemmatize(text, lemmatizer):
+def lemmatize(text, lemma_cache=None):
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
     tokens = nltk.word_tokenize(text)
     pos_tags = pos_tag(tokens)
-    lemmatized_tokens = [lemmatizer.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
+    lemmatized_tokens = [lemma_cache.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
     return ' '.join(lemmatized_tokens)
 
 def remove_stops(text, stops):
@@ -84,9 +89,10 @@ def remove_stops(text, stops):
     final = ''.join([i for i in final if not i.isdigit()])  # remove digits
     return ' '.join(final.split())  # remove extra spaces
 
-def clean_docs(docs, stops):
-    lemmatizer = WordNetLemmatizer()
-    return [lemmatize(remove_stops(doc.lower(), stops), lemmatizer) for doc in docs]
+def clean_docs(docs, stops, n_jobs=1, cache_file=None):
+    # Batched tokenization, POS tagging and lemmatization (the same as lemmatize of each doc)
+    docs_without_stops = [remove_stops(doc.lower(), stops) for doc in docs]
+    return [' '.join(lemmas) for lemmas in lemmatize_texts(docs_without_stops, n_jobs=n_jobs, cache_file=cache_file)]
 
 my_stops = ['um', 'uh', 'affirmative', 'laugh', 'mmhmm', 'oh', 'hello', 'hi']
 stops = list(set(stopwords.words("english") + my_stops))
@@ -98,17 +104,15 @@ long_conversations = df_long_conversations['file_name'].to_list()
 
 project_root = get_project_root()
 source_file_path = os.path.join(project_root, 'data', 'raw_files', 'merged_conversations', 'all_conversations_raw_files.json')
-with open(source_file_path, 'r') as source_file:
-    data = json.load(source_file)
 
 # Create vocabulary (from entire data)
 entire_text = []
-for file in data:
+for file, content in iter_conversations(source_file_path):
     if file in long_conversations:
         continue  # Extracts words from long conversations only
-    entire_text.extend([utterance['text'] for utterance in data[file]['transcript']])
+    entire_text.extend([utterance['text'] for utterance in content['transcript']])
 
-clean_text = clean_docs(entire_text, stops)
+clean_text = clean_docs(entire_text, stops, cache_file=lemma_cache_file)
 vocabulary = set(' '.join(clean_text).split())
 
 all_similar_words_by_topic = {}
@@ -10,7 +10,6 @@ This script performs text clustering on conversation transcripts using TF-IDF ve
 """
 
 import nltk
-from nltk import WordNetLemmatizer
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import string
@@ -18,6 +17,7 @@ from nltk.corpus import stopwords
 import json
 import os
 from src.utils.common import get_project_root
+from src.utils.lemma_cache import get_lemma_cache
 
 # Function to load data from a JSON file
 def load_data(file):
@@ -26,20 +26,21 @@ def load_data(file):
     return data
 
 # Function to lemmatize text
-def lemmatize(text, lemmatizer):
+def lemmatize(text, lemma_cache=None):
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
     tokens = nltk.word_tokenize(text)
-    lemmatized_tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    lemmatized_tokens = [lemma_cache.lemmatize(token) for token in tokens]
     return ' '.join(lemmatized_tokens)
 
 # Function to clean and preprocess documents
 def clean_docs(docs):
     my_stops = ['um', 'uh', 'affirmative', 'laugh', 'mmhmm', 'mm-hmm', 'oh']
     stops = set(stopwords.words("english") + my_stops)
-    lemmatizer = WordNetLemmatizer()
+    lemma_cache = get_lemma_cache()
     final = []
     for doc in docs:
         clean_doc = remove_stops(doc.lower(), stops)
-        lemmatized_doc = lemmatize(clean_doc, lemmatizer)
+        lemmatized_doc = lemmatize(clean_doc, lemma_cache)
         final.append(lemmatized_doc)
     return final
 
@@ -16,8 +16,10 @@ from nltk.corpus import wordnet
 from sklearn.feature_extraction.text import TfidfVectorizer
 from src.data.generated_tagged_utterances import generated_utterances_by_topic
 import nltk
-from nltk import WordNetLemmatizer
 import string
+from src.utils.lemma_cache import get_lemma_cache
+from src.utils.batch_preprocessing import lemmatize_texts
+from src.utils.constants import lemma_cache_file
 
 def get_wordnet_pos(treebank_tag):
     if treebank_tag.startswith('J'):
@@ -31,20 +33,17 @@ def get_wordnet_pos(treebank_tag):
     else:
         return wordnet.NOUN
 
-def lemmatize(text, lemmatizer):
+def lemmatize(text, lemma_cache=None):
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
     tokens = nltk.word_tokenize(text)
     pos_tags = pos_tag(tokens)
-    lemmatized_tokens = [lemmatizer.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
+    lemmatized_tokens = [lemma_cache.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
     return ' '.join(lemmatized_tokens)
 
-def clean_docs(docs, stops):
-    lemmatizer = WordNetLemmatizer()
-    final = []
-    for doc in docs:
-        clean_doc = remove_stops(doc.lower(), stops)
-        lemmatized_doc = lemmatize(clean_doc, lemmatizer)
-        final.append(lemmatized_doc)
-    return final
+def clean_docs(docs, stops, n_jobs=1, cache_file=None):
+    # Batched tokenization, POS tagging and lemmatization (the same as lemmatize of each doc)
+    docs_without_stops = [remove_stops(doc.lower(), stops) for doc in docs]
+    return [' '.join(lemmas) for lemmas in lemmatize_texts(docs_without_stops, n_jobs=n_jobs, cache_file=cache_file)]
 
 def remove_stops(text, stops):
     words = text.split()
@@ -96,7 +95,7 @@ for topic_num in range(1, 12):
     current_topic_utterances = ' '.join(current_topic_utterances)
     list_of_utterances_by_topics.append(current_topic_utterances)
 
-processed_data = clean_docs(docs=list_of_utterances_by_topics, stops=stops)
+processed_data = clean_docs(docs=list_of_utterances_by_topics, stops=stops, cache_file=lemma_cache_file)
 X = vectorizer.fit_transform(processed_data)  # receives a list of utterances and returns document-term matrix
 X_array = X.toarray()
 
@@ -20,14 +20,6 @@ os.makedirs(os.path.dirname(export_file_path), exist_ok=True)
 # Login to Hugging Face Hub using a personal access token for authentication
 login(token="huggingface_token")  # User Access Token
 
-def create_single_recording_text(df_single_recording):
-    recording_id = df_single_recording['recording_id'].iloc[0]
-    recording_text = " ".join(
-        "Speaker " + row['speaker'] + ': ' + row['text']
-        for _, row in df_single_recording.iterrows()
-    )
-    return recording_id, recording_text
-
 general_prompt_v1 = """
 Choose one of the following options based on the conversation segment:
 {question}
@@ -174,6 +166,10 @@ from src.utils.common import get_project_root
 import os
 from src.utils.constants import raw_data_df, cities_file
 from src.data.data_pipeline_functions import clean_data
+from src.data.conversation_index import ConversationIndex
+from src.data.text_arena import TextArena
+from src.data.call_gating import get_recordings_to_process
+from src.data.near_duplicates import cluster_near_duplicates, propagate_cluster_labels
 
 
 print("Staring script...")
@@ -189,7 +185,28 @@ print("Filtering and fixing utterances...")
 df = clean_data(df, cities_file=cities_file, cities_threshold=3) # includes keeping only long convs
 
 
-print(f"Number of recordings in Data: {len(df['recording_id'].unique())}")
+# Index the utterances by recording (constant-time access to the utterances of each recording), and keep the
+# "Speaker X: text" lines of all recordings in a single text arena
+df['text_with_speaker'] = 'Speaker ' + df['speaker'].astype(str) + ': ' + df['text']
+conversation_index = ConversationIndex(df)
+text_arena = TextArena.from_dataframe(conversation_index, text_column='text_with_speaker', sep=' ')
+num_utterances_per_recording = raw_data_df['recording_id'].value_counts()
+recording_ids = conversation_index.recording_ids
+
+# Gate answering machines, IVR and hold-music calls before inference (scored from metadata only).
+# A single heuristic flag does not drop a call: at least two flags must agree
+recordings_to_process = set(get_recordings_to_process(df, min_flags=2))
+gated_recordings = set(recording_ids) - recordings_to_process
+recording_ids = [recording_id for recording_id in recording_ids if recording_id not in gated_recordings]
+print(f"Gated recordings (not sent to the model): {len(gated_recordings)}")
+
+# Classify one recording per cluster of near-identical recordings; the labels are propagated to the cluster
+clusters = cluster_near_duplicates(df[~df['recording_id'].isin(gated_recordings)])
+representatives = set(clusters)
+recording_ids = [recording_id for recording_id in recording_ids if recording_id in representatives]
+print(f"Near-duplicate recordings (labels propagated from their cluster): {len(clusters) - len(representatives)}")
+
+print(f"Number of recordings in Data: {len(recording_ids)}")
 print()
 print("Starting inference...")
 
@@ -198,12 +215,11 @@ batch_counter = 0
 batch_list = []
 batch_size = 100
 # df_list = []
-for i, recording_id in enumerate(df['recording_id'].unique()):
+for i, recording_id in enumerate(recording_ids):
     start_time = time.time()
-    num_utterances = raw_data_df[raw_data_df['recording_id'] == recording_id].shape[0]
-    print(f"Processing recording {i+1}/{len(df['recording_id'].unique())} ({num_utterances} utterances): {recording_id}")
-    single_recording_df = df[df['recording_id'] == recording_id]
-    current_recording_id, current_recording_text = create_single_recording_text(single_recording_df)
+    num_utterances = num_utterances_per_recording[recording_id]
+    print(f"Processing recording {i+1}/{len(recording_ids)} ({num_utterances} utterances): {recording_id}")
+    current_recording_id, current_recording_text = recording_id, text_arena.get_conversation(recording_id)
     current_df = classify_RAG_FLAN(
         recording_id=current_recording_id,
         recording_entire_text=current_recording_text,
@@ -220,8 +236,8 @@ for i, recording_id in enumerate(df['recording_id'].unique()):
     batch_counter += 1
 
     if batch_counter >= batch_size:
-        # Concatenate and save the current batch
-        batch_df = pd.concat(batch_list, ignore_index=True)
+        # Concatenate and save the current batch (with the labels of the near-duplicates of its recordings)
+        batch_df = propagate_cluster_labels(pd.concat(batch_list, ignore_index=True), clusters)
         batch_filename = f"/home/adir/yair/output/classified_recordings_RAG_FLAN_batch_{i // batch_size + 1}.csv"
         batch_df.to_csv(batch_filename, index=False)
         print(f"Saved batch {i // batch_size + 1} to {batch_filename}")
@@ -235,7 +251,7 @@ for i, recording_id in enumerate(df['recording_id'].unique()):
 
 # Save any remaining rows in the last batch
 if batch_list:
-    batch_df = pd.concat(batch_list, ignore_index=True)
+    batch_df = propagate_cluster_labels(pd.concat(batch_list, ignore_index=True), clusters)
     batch_filename = f"/home/adir/yair/output/classified_recordings_RAG_FLAN_batch_{(i // batch_size) + 1}.csv"
     batch_df.to_csv(batch_filename, index=False)
     print(f"Saved final batch to {batch_filename}")
@@ -9,7 +9,7 @@ Preprocessing for RAG:
 import pandas as pd
 
 from src.data.fixes_filter import get_long_convs
-from src.utils.constants import raw_data_df
+from src.utils.constants import load_raw_data_df
 
 
 def preprocess_for_RAG(dataframe: pd.DataFrame, enumerate_file_names=False) -> dict:
@@ -53,7 +53,7 @@ def concatenate_all_recordings(dataframe):
     :returns: A dictionary with recording_id (keys) and concatenated utterance texts (values).
     """
     full_text_per_recording_id = {}
-    for recording_id, subset_of_utterances in dataframe.groupby('recording_id'):
+    for recording_id, subset_of_utterances in dataframe.groupby('recording_id', observed=True):
         full_text_per_recording_id[recording_id] = " ".join(subset_of_utterances['text_with_speaker'].tolist())
     return full_text_per_recording_id
 
@@ -62,7 +62,7 @@ if __name__ == '__main__':
     # Example usage
 
     # Load raw dataframe
-    df = raw_data_df.copy()
+    df = load_raw_data_df(columns=['recording_id', 'speaker', 'text']).copy()
 
     # Filter long conversations
     # todo maybe set here a threshold?
@@ -11,7 +11,7 @@ from sentence_transformers import SentenceTransformer
 import get_model
 from preprocessing_for_RAG import preprocess_for_RAG  # Performs preprocessing the prepares segments (chunks) for RAG model
 from prompts import topic_prompts, prompt_template
-from src.utils.constants import raw_data_df
+from src.utils.constants import load_raw_data_df
 
 # Choosing and loading model
 llm = get_model.mistral()
@@ -19,9 +19,9 @@ llm = get_model.mistral()
 
 
 # ---------------------- Assigning context text ----------------------
-# Load raw dataframe
-df = raw_data_df.copy()
-df_single_conv = df[df['recording_id'] == 'd5c13967-e360-4be9-b8d4-1485a1830c89']  # Replace as needed
+# Load raw dataframe, and only the utterances of a single recording
+df = load_raw_data_df().copy()
+df_single_conv = load_raw_data_df(recording_ids=['d5c13967-e360-4be9-b8d4-1485a1830c89']).copy()  # Replace as needed
 
 # Preprocess data
 # processed_dict is a dictionary with recording_id (keys) and list of concatenated utterance texts (values).
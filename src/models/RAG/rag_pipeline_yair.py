@@ -9,14 +9,13 @@ from langchain_core.prompts import PromptTemplate
 import get_model
 from preprocessing_for_RAG import preprocess_for_RAG  # Performs preprocessing that concatenates all utterances for RAG model
 from prompts_yair import topic_prompts, prompt_templates
-from src.utils.constants import raw_data_df
+from src.utils.constants import load_raw_data_df
 
 # Choosing and loading the model
 llm = get_model.mistral()
 
-# Load raw dataframe and filter for a single conversation
-df = raw_data_df.copy()
-df_single_conv = df[df['recording_id'] == 'd5c13967-e360-4be9-b8d4-1485a1830c89']  # Replace as needed
+# Load only the utterances of a single recording from the raw dataframe
+df_single_conv = load_raw_data_df(recording_ids=['d5c13967-e360-4be9-b8d4-1485a1830c89']).copy()  # Replace as needed
 
 # Preprocess data to concatenate all utterances for each recording_id into a single text
 entire_convs_dict = preprocess_for_RAG(df_single_conv)
@@ -9,13 +9,15 @@ This script classifies utterances from a specified file based on predefined cust
 
 import string
 import nltk
-from nltk import pos_tag, WordNetLemmatizer
+from nltk import pos_tag
 from nltk.corpus import stopwords, wordnet
 from src.utils.common import get_project_root
 import json
 import pandas as pd
 import os
-from src.utils.constants import MY_STOPS
+from src.utils.constants import MY_STOPS, load_raw_data_df
+from src.utils.lemma_cache import get_lemma_cache
+from src.utils.batch_preprocessing import lemmatize_texts
 
 # Custom keywords for each topic
 custom_keywords = {
@@ -50,13 +52,14 @@ def get_wordnet_pos(treebank_tag):
     else:
         return wordnet.NOUN
 
-def lemmatize(text, lemmatizer):
+def lemmatize(text, lemma_cache=None):
     """
-    Lemmatize the given text based on POS tags.
+    Lemmatize the given text based on POS tags (lemmas are memoized in the shared lemma cache).
     """
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
     tokens = nltk.word_tokenize(text)
     pos_tags = pos_tag(tokens)
-    lemmatized_tokens = [lemmatizer.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
+    lemmatized_tokens = [lemma_cache.lemmatize(token, get_wordnet_pos(tag)) for token, tag in pos_tags]
     return ' '.join(lemmatized_tokens)
 
 def remove_stops(text, stops):
@@ -74,12 +77,19 @@ def clean_text(text, stops):
     """
     Clean the given text by converting to lowercase, removing stopwords, punctuation, digits, and lemmatizing.
     """
-    lemmatizer = WordNetLemmatizer()
     text = text.lower()
     text = remove_stops(text, stops)
-    text = lemmatize(text, lemmatizer)
+    text = lemmatize(text)
     return text
 
+def clean_texts(texts, stops, n_jobs=1, cache_file=None):
+    """
+    Clean a column of utterances (the same as clean_text of each utterance), with batched tokenization,
+    POS tagging and lemmatization. With cache_file, the lemma cache is loaded from and saved to it.
+    """
+    texts = [remove_stops(text.lower(), stops) for text in texts]
+    return [' '.join(lemmas) for lemmas in lemmatize_texts(texts, n_jobs=n_jobs, cache_file=cache_file)]
+
 # Extend the list of stopwords
 stops = list(set(stopwords.words("english") + MY_STOPS))
 stops.remove('from')
@@ -89,8 +99,12 @@ def classify_single_utterance(utterance, keywords, stops):
     """
     Classify a single utterance by checking for the presence of keywords and mapping it to a topic.
     """
-    utterance = clean_text(utterance, stops)
+    return classify_clean_utterance(clean_text(utterance, stops), keywords)
 
+def classify_clean_utterance(utterance, keywords):
+    """
+    Classify an utterance that was already cleaned (clean_text / clean_texts).
+    """
     # Check if utterance is too short
     min_number_of_words = 5
     if len(utterance.split()) < min_number_of_words:
@@ -112,19 +126,19 @@ def classify_single_utterance(utterance, keywords, stops):
 
 
 # Function to classify utterances
-def classify_utterances(utterances_df: pd.DataFrame, keywords, stops):
+def classify_utterances(utterances_df: pd.DataFrame, keywords, stops, n_jobs=1, cache_file=None):
     """
     Takes raw_df of utterances to classify as input, classifies the utterances and return an updated df with
-    a column "prediction" for each utterance.
+    a column "prediction" for each utterance. The utterances are cleaned in one batch (see clean_texts).
     """
-    utterances_df['prediction'] = utterances_df['text'].apply(classify_single_utterance, keywords=keywords, stops=stops)
+    clean_utterances = clean_texts(utterances_df['text'], stops, n_jobs=n_jobs, cache_file=cache_file)
+    utterances_df['prediction'] = [classify_clean_utterance(utterance, keywords) for utterance in clean_utterances]
     return utterances_df
 
 
-# Select utterances to classify
-project_root = get_project_root()
-source_file_path = os.path.join(project_root, 'data', 'processed', 'all_raw_utterances_df.csv')
-all_data_df = pd.read_csv(source_file_path)
+if __name__ == '__main__':
+    # Select utterances to classify
+    all_data_df = load_raw_data_df(columns=['file_name', 'text'])
 
 # file_name = '6384d7ed9ba32b2c50b0094f_4f0f231c-e42e-4f8d-a2d7-77ad2477098d.json'
 # utterances_to_classify = all_data_df.loc[all_data_df['file_name'] == file_name, 'text'].to_list()
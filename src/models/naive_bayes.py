@@ -15,7 +15,7 @@ from sklearn.model_selection import cross_val_score
 from src.data.generated_tagged_utterances import generated_utterances_by_topic
 from src.utils.preprocessing import preprocess_data
 import os
-import json
+from src.data.conversations_reader import get_conversation
 
 # Prepare data for tf-idf (inputs and labels)
 topic_dict = {
@@ -77,11 +77,9 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 source_file_path = os.path.join(project_root, 'data', 'raw_files', 'merged_conversations', 'all_conversations_raw_files.json')
 
 # Predict on unseen data
-with open(source_file_path, 'r') as file:
-    new_data = json.load(file)
-
 filename = '63a5c929b5b42ce1b7e2d6eb_8fda73ca-ccd2-4fe7-8244-cce5962da756.json'
-all_utterances = [utterance['text'] for utterance in new_data[filename]['transcript']]
+new_conversation = get_conversation(source_file_path, filename)
+all_utterances = [utterance['text'] for utterance in new_conversation['transcript']]
 
 X_new = preprocess_data(all_utterances)
 X_new = vectorizer.transform(X_new)
@@ -0,0 +1,117 @@
+"""
+This script contains a batched tokenization, POS tagging and lemmatization API for a whole column of utterances.
+1. Each distinct text is processed once (short utterances such as 'yes' or 'okay' repeat many times in the corpus).
+2. The distinct texts are tokenized with nltk.word_tokenize, tagged with nltk.pos_tag_sents (a single tagger for
+   all the texts, each text tagged as one sentence, like pos_tag) and lemmatized through the shared lemma cache.
+3. The distinct texts can be processed by chunks in worker processes.
+4. With a cache file, the lemma cache is loaded from it (in the current process and in each worker process), and
+   saved to it after the batch, with the lemmas computed by the workers.
+The lemmas of each text are the same as those of the per-utterance lemmatize functions
+(lemmatizer.lemmatize(token, get_wordnet_pos(tag)) over pos_tag(word_tokenize(text))).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import nltk
+
+from src.utils.lemma_cache import NOUN, VERB, ADJ, ADV, get_lemma_cache
+
+DEFAULT_CHUNK_SIZE = 20_000
+
+
+def get_wordnet_pos(treebank_tag):
+    """
+    Map POS tag to first character lemmatize() accepts.
+    """
+    if treebank_tag.startswith('J'):
+        return ADJ
+    elif treebank_tag.startswith('V'):
+        return VERB
+    elif treebank_tag.startswith('N'):
+        return NOUN
+    elif treebank_tag.startswith('R'):
+        return ADV
+    else:
+        return NOUN
+
+
+def tokenize_texts(texts) -> list:
+    """
+    Returns the tokens (nltk.word_tokenize) of each text.
+    """
+    return [nltk.word_tokenize(text) for text in texts]
+
+
+def pos_tag_texts(tokenized_texts) -> list:
+    """
+    Returns the (token, treebank_tag) pairs of each tokenized text, tagged in one batch.
+    """
+    return nltk.pos_tag_sents(tokenized_texts)
+
+
+def lemmatize_tagged_texts(tagged_texts, lemma_cache=None) -> list:
+    """
+    Returns the lemmas of each tagged text (list of (token, treebank_tag) pairs).
+    """
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
+    return [[lemma_cache.lemmatize(token, get_wordnet_pos(tag)) for token, tag in tagged_text]
+            for tagged_text in tagged_texts]
+
+
+def _init_worker(cache_file=None):
+    get_lemma_cache(cache_file)
+
+
+def _lemmatize_chunk(texts, use_pos_tags=True, return_entries=False):
+    lemma_cache = get_lemma_cache()
+    tokenized_texts = tokenize_texts(texts)
+    if use_pos_tags:
+        keys_of_texts = [[(token, get_wordnet_pos(tag)) for token, tag in tagged_text]
+                         for tagged_text in pos_tag_texts(tokenized_texts)]
+    else:
+        keys_of_texts = [[(token, NOUN) for token in tokens] for tokens in tokenized_texts]
+    lemmas_of_texts = [[lemma_cache.lemmatize(token, wordnet_pos) for token, wordnet_pos in keys]
+                       for keys in keys_of_texts]
+    if not return_entries:
+        return lemmas_of_texts
+    # The (token, wordnet_pos) -> lemma entries of the chunk, for the cache of the parent process
+    entries = {key: lemma for keys, lemmas in zip(keys_of_texts, lemmas_of_texts) for key, lemma in zip(keys, lemmas)}
+    return lemmas_of_texts, entries
+
+
+def lemmatize_texts(texts, use_pos_tags=True, n_jobs=1, chunk_size=DEFAULT_CHUNK_SIZE, cache_file=None) -> list:
+    """
+    Tokenizes, POS tags and lemmatizes a column of utterances.
+
+    Args:
+        texts (iterable): Texts of the utterances (e.g., a pd.Series or a list of strings).
+        use_pos_tags (bool): Lemmatize each token by its POS tag (True), or as a noun without tagging (False,
+                             like utils.preprocessing.lemmatize).
+        n_jobs (int): Number of worker processes (1 - in the current process, None - all CPU cores).
+        chunk_size (int): Number of distinct texts per worker task.
+        cache_file (str): JSON file of the lemma cache (see LemmaCache.save). If given, the cache of the current
+                          process and of the workers is loaded from it, and saved to it after the batch.
+
+    Returns:
+        list: The list of lemmas of each text (same order as texts).
+    """
+    texts = list(texts)
+    unique_texts = list(dict.fromkeys(texts))
+    lemma_cache = get_lemma_cache(cache_file)
+    if n_jobs == 1 or len(unique_texts) <= chunk_size:
+        unique_lemmas = _lemmatize_chunk(unique_texts, use_pos_tags)
+    else:
+        lemmatize_chunk = partial(_lemmatize_chunk, use_pos_tags=use_pos_tags, return_entries=cache_file is not None)
+        chunks = [unique_texts[start:start + chunk_size] for start in range(0, len(unique_texts), chunk_size)]
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(cache_file,)) as pool:
+            chunk_results = list(pool.map(lemmatize_chunk, chunks))
+        if cache_file is not None:
+            for _, entries in chunk_results:
+                lemma_cache.add_entries(entries)
+            chunk_results = [chunk_lemmas for chunk_lemmas, _ in chunk_results]
+        unique_lemmas = [lemmas for chunk_lemmas in chunk_results for lemmas in chunk_lemmas]
+    if cache_file is not None:
+        lemma_cache.save(cache_file)
+    lemmas_by_text = dict(zip(unique_texts, unique_lemmas))
+    return [list(lemmas_by_text[text]) for text in texts]
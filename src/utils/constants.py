@@ -1,22 +1,101 @@
 
 """
 This script contains constants that are needed throughout the project.
+
+The utterances DataFrame (raw_data_df) is loaded lazily, on first access, and memoized.
+Use load_raw_data_df to load only some of the columns / recordings.
 """
 
 import os
+from functools import lru_cache
 
 import pandas as pd
 
 # Determine the project's root directory
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Create raw_data_df DataFarme
+# Files of raw_data_df DataFarme (the Parquet store is preferred over the CSV file when it exists)
 raw_data_file = os.path.join(project_root, 'data', 'processed', 'all_raw_utterances_df.csv')
+utterance_store_path = os.path.join(project_root, 'data', 'processed', 'utterance_store')
+
+# Folder of the per-utterance feature store (see src/data/utterance_features.py)
+utterance_features_path = os.path.join(project_root, 'data', 'processed', 'utterance_features')
+
+# File of the persisted lemma cache (see src/utils/lemma_cache.py)
+lemma_cache_file = os.path.join(project_root, 'data', 'processed', 'lemma_cache.json')
+
+# Explicit dtypes of the utterances DataFrame columns
+RAW_DATA_DTYPES = {
+    'file_name': 'object',
+    'recording_id': 'category',
+    'member_id': 'category',
+    'utterance_id': 'object',
+    'speaker': 'category',
+    'time': 'int64',
+    'text': 'object',
+    'duration': 'int64'
+}
+
+
+def load_raw_data_df(columns=None, recording_ids=None) -> pd.DataFrame:
+    """
+    Loads the utterances DataFrame with explicit dtypes (categorical 'recording_id', 'member_id' and 'speaker').
+    Results are memoized, so repeated calls with the same arguments return the same DataFrame object -
+    copy it before modifying it.
+
+    Args:
+        columns (list): Columns to load (default: all columns).
+        recording_ids (list): If given, loads only the utterances of these recordings.
+
+    Returns:
+        pd.DataFrame: The utterances DataFrame.
+    """
+    if columns is not None:
+        columns = tuple(columns)
+    if recording_ids is not None:
+        recording_ids = tuple(sorted({str(recording_id) for recording_id in recording_ids}))
+    return _load_raw_data_df(columns, recording_ids)
+
+
+@lru_cache(maxsize=8)
+def _load_raw_data_df(columns, recording_ids):
+    if os.path.exists(utterance_store_path):
+        from src.data.utterance_store import read_utterance_store
+        df = read_utterance_store(utterance_store_path, columns=columns, recording_ids=recording_ids)
+    elif os.path.exists(raw_data_file):
+        df = _read_raw_data_csv(columns, recording_ids)
+    else:
+        raise FileNotFoundError(f"File not found: {raw_data_file}")
+
+    dtypes = {column: dtype for column, dtype in RAW_DATA_DTYPES.items() if column in df.columns}
+    df = df.astype(dtypes)
+    for column, dtype in dtypes.items():
+        if dtype == 'category':
+            df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+def _read_raw_data_csv(columns, recording_ids, chunk_size=500000):
+    usecols = None
+    if columns is not None:
+        usecols = list(columns) if recording_ids is None else list(dict.fromkeys(columns + ('recording_id',)))
+    # Identifiers are read as strings (member IDs made of digits only must not become numbers)
+    dtypes = {column: 'str' for column in ('file_name', 'recording_id', 'member_id', 'utterance_id', 'speaker')}
+    if recording_ids is None:
+        return pd.read_csv(raw_data_file, usecols=usecols, dtype=dtypes)
+
+    # Filter the recordings chunk by chunk, so the entire file is never held in memory
+    chunks = [chunk[chunk['recording_id'].isin(recording_ids)]
+              for chunk in pd.read_csv(raw_data_file, usecols=usecols, dtype=dtypes, chunksize=chunk_size)]
+    df = pd.concat(chunks, ignore_index=True)
+    return df[list(columns)] if columns is not None else df
+
 
-if os.path.exists(raw_data_file):
-    raw_data_df = pd.read_csv(raw_data_file)
-else:
-    raise FileNotFoundError(f"File not found: {raw_data_file}")
+def __getattr__(name):
+    # Lazy module attribute: 'from src.utils.constants import raw_data_df' loads the data only when imported
+    if name == 'raw_data_df':
+        return load_raw_data_df()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Dictionary mapping numbers to topic names
@@ -0,0 +1,138 @@
+"""
+This script contains an ID dictionary layer that maps string identifiers (recording_id, member_id, utterance_id -
+36-char UUID strings) to dense int32 codes and back, with dictionaries that can be saved and extended, so the
+codes stay the same across runs.
+The pipeline keeps the string identifiers (the result files and their joins use them); the codes are for results
+that are stored or exchanged as integer keys.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Identifier columns that are encoded by default
+ID_COLUMNS = ['recording_id', 'member_id', 'utterance_id']
+
+
+class IdDictionary:
+    """
+    Maps identifiers to dense int32 codes (0, 1, 2, ... in order of first appearance) with reverse lookup.
+    Codes of identifiers that were already added never change, so codes in saved result files stay valid.
+    """
+
+    def __init__(self, ids=None):
+        self._index = pd.Index([], dtype=object)
+        if ids is not None:
+            self.add(ids)
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, ids):
+        """
+        Adds the identifiers that are not in the dictionary yet (new codes are appended at the end).
+        """
+        ids = pd.unique(pd.Series(ids, dtype=object).dropna().to_numpy())
+        new_ids = ids[self._index.get_indexer(ids) == -1]
+        if len(new_ids):
+            self._index = self._index.append(pd.Index(new_ids, dtype=object))
+        if len(self._index) > np.iinfo(np.int32).max:
+            raise OverflowError("Too many identifiers for int32 codes")
+
+    def encode(self, ids, add_missing=True) -> np.ndarray:
+        """
+        Returns the int32 codes of the identifiers. Unknown identifiers are added to the dictionary, unless
+        add_missing is False, in which case their code is -1.
+        """
+        ids = pd.Series(ids, dtype=object).to_numpy()
+        if add_missing:
+            self.add(ids)
+        return self._index.get_indexer(ids).astype(np.int32)
+
+    def decode(self, codes) -> np.ndarray:
+        """
+        Returns the identifiers of the codes (reverse lookup). Code -1 is decoded to None.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        ids = np.full(len(codes), None, dtype=object)
+        known = codes >= 0
+        ids[known] = self._index.to_numpy()[codes[known]]
+        return ids
+
+    def save(self, file_path):
+        """
+        Saves the dictionary as a text file with one identifier per line (the line number is the code).
+        """
+        with open(file_path, 'w') as ids_file:
+            ids_file.writelines(f'{id_}\n' for id_ in self._index)
+
+    @classmethod
+    def load(cls, file_path):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with open(file_path, 'r') as ids_file:
+            return cls([line.rstrip('\n') for line in ids_file])
+
+
+def encode_id_columns(df: pd.DataFrame, id_dictionaries=None, columns=None):
+    """
+    Adds an int32 code column ('<column>_code', e.g., 'recording_code') for each identifier column.
+
+    Args:
+        df (pd.DataFrame): DataFrame with identifier columns.
+        id_dictionaries (dict): Column name (key) and IdDictionary (value). Missing dictionaries are created.
+        columns (list): Identifier columns to encode (default: the columns of ID_COLUMNS that are in 'df').
+
+    Returns:
+        tuple: (DataFrame with the code columns, dictionary of the IdDictionary objects that were used)
+    """
+    if id_dictionaries is None:
+        id_dictionaries = {}
+    if columns is None:
+        columns = [column for column in ID_COLUMNS if column in df.columns]
+
+    df = df.copy()
+    for column in columns:
+        id_dictionary = id_dictionaries.setdefault(column, IdDictionary())
+        df[code_column_name(column)] = id_dictionary.encode(df[column])
+    return df, id_dictionaries
+
+
+def decode_id_columns(df: pd.DataFrame, id_dictionaries: dict, drop_codes=False) -> pd.DataFrame:
+    """
+    Restores the identifier columns from their code columns (reverse of encode_id_columns).
+    """
+    df = df.copy()
+    for column, id_dictionary in id_dictionaries.items():
+        code_column = code_column_name(column)
+        if code_column in df.columns:
+            df[column] = id_dictionary.decode(df[code_column])
+            if drop_codes:
+                df = df.drop(columns=code_column)
+    return df
+
+
+def code_column_name(column: str) -> str:
+    """
+    Returns the name of the code column of an identifier column ('recording_id' -> 'recording_code').
+    """
+    return column[:-3] + '_code' if column.endswith('_id') else column + '_code'
+
+
+def save_id_dictionaries(id_dictionaries: dict, folder_path: str):
+    """
+    Saves each IdDictionary to '<folder_path>/<column>.txt'.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    for column, id_dictionary in id_dictionaries.items():
+        id_dictionary.save(os.path.join(folder_path, f'{column}.txt'))
+
+
+def load_id_dictionaries(folder_path: str, columns=None) -> dict:
+    """
+    Loads the dictionaries saved by save_id_dictionaries.
+    """
+    if columns is None:
+        columns = [file[:-4] for file in sorted(os.listdir(folder_path)) if file.endswith('.txt')]
+    return {column: IdDictionary.load(os.path.join(folder_path, f'{column}.txt')) for column in columns}
@@ -0,0 +1,131 @@
+"""
+This script contains a shared lemma cache for the preprocessing code paths (utils.preprocessing, the rule-based
+classifiers and the TF-IDF / Flair features).
+1. Lemmas are memoized by (token, wordnet_pos), so a repeated token skips the WordNet lookup. The conversational
+   vocabulary is small compared with the number of tokens, so almost all lookups are cache hits.
+2. The cache is bounded (least recently used entries are evicted first).
+3. The cache can be saved to / loaded from a JSON file, and pre-warmed from the corpus vocabulary.
+"""
+
+import json
+import os
+import uuid
+from collections import OrderedDict
+
+from nltk import WordNetLemmatizer
+
+# WordNet POS tags (the values of wordnet.NOUN, VERB, ADJ and ADV, without loading the WordNet corpus)
+NOUN, VERB, ADJ, ADV = 'n', 'v', 'a', 'r'
+WORDNET_POS_TAGS = [NOUN, VERB, ADJ, ADV]
+
+DEFAULT_MAXSIZE = 200_000
+
+
+class LemmaCache:
+    """
+    Bounded LRU cache of WordNetLemmatizer.lemmatize, keyed by (token, wordnet_pos).
+
+    Usage:
+        lemma_cache = get_lemma_cache()
+        lemmas = [lemma_cache.lemmatize(token, pos) for token, pos in tagged_tokens]
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, cache_file=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lemmas = OrderedDict()
+        self._lemmatizer = None
+        self.loaded_files = set()  # Absolute paths of the files loaded into the cache
+        if cache_file is not None and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    def __len__(self):
+        return len(self._lemmas)
+
+    def lemmatize(self, token, wordnet_pos=NOUN):
+        """
+        Returns the lemma of the token (the same as WordNetLemmatizer().lemmatize(token, wordnet_pos)).
+        """
+        key = (token, wordnet_pos)
+        lemma = self._lemmas.get(key)
+        if lemma is not None:
+            self.hits += 1
+            self._lemmas.move_to_end(key)
+            return lemma
+        self.misses += 1
+        if self._lemmatizer is None:
+            self._lemmatizer = WordNetLemmatizer()
+        lemma = self._lemmatizer.lemmatize(token, wordnet_pos)
+        self._add(key, lemma)
+        return lemma
+
+    def warm(self, vocabulary, wordnet_pos_tags=None):
+        """
+        Pre-computes the lemmas of the vocabulary (e.g., the unique tokens of the corpus) for each POS tag.
+
+        Args:
+            vocabulary (iterable): Tokens.
+            wordnet_pos_tags (list): WordNet POS tags to compute (default: WORDNET_POS_TAGS).
+        """
+        for token in vocabulary:
+            for wordnet_pos in wordnet_pos_tags or WORDNET_POS_TAGS:
+                self.lemmatize(token, wordnet_pos)
+
+    def add_entries(self, entries):
+        """
+        Adds computed lemmas (a dict of (token, wordnet_pos) -> lemma, e.g., from the caches of worker processes).
+        """
+        for key, lemma in entries.items():
+            self._add(key, lemma)
+
+    def cache_info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.maxsize, 'currsize': len(self._lemmas)}
+
+    def clear(self):
+        self._lemmas.clear()
+        self.loaded_files.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, cache_file):
+        """
+        Saves the cache to a JSON file (a list of [token, wordnet_pos, lemma], least recently used first).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        temp_file = f'{cache_file}.{uuid.uuid4().hex}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump([[token, wordnet_pos, lemma] for (token, wordnet_pos), lemma in self._lemmas.items()], f)
+        os.replace(temp_file, cache_file)
+
+    def load(self, cache_file):
+        """
+        Adds the entries of a JSON file saved by save (the entries of the file are the most recently used).
+        """
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            for token, wordnet_pos, lemma in json.load(f):
+                self._add((token, wordnet_pos), lemma)
+        self.loaded_files.add(os.path.abspath(cache_file))
+
+    def _add(self, key, lemma):
+        self._lemmas[key] = lemma
+        self._lemmas.move_to_end(key)
+        if len(self._lemmas) > self.maxsize:
+            self._lemmas.popitem(last=False)
+
+
+_shared_lemma_cache = None
+
+
+def get_lemma_cache(cache_file=None) -> LemmaCache:
+    """
+    Returns the lemma cache shared by the preprocessing code paths of the process (created on the first call;
+    the entries of cache_file, if given and exists, are loaded into it once per process).
+    """
+    global _shared_lemma_cache
+    if _shared_lemma_cache is None:
+        _shared_lemma_cache = LemmaCache()
+    if cache_file is not None and os.path.abspath(cache_file) not in _shared_lemma_cache.loaded_files \
+            and os.path.exists(cache_file):
+        _shared_lemma_cache.load(cache_file)
+    return _shared_lemma_cache
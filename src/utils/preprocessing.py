@@ -3,14 +3,17 @@ This script provides functions to preprocess text data.
 """
 
 import nltk
-from nltk import WordNetLemmatizer
 from nltk.corpus import stopwords
 import string
+from src.utils.lemma_cache import get_lemma_cache
+from src.utils.batch_preprocessing import lemmatize_texts
+from src.utils.constants import lemma_cache_file
 
 
-def lemmatize(text, lemmatizer):
+def lemmatize(text, lemma_cache=None):
+    lemma_cache = get_lemma_cache() if lemma_cache is None else lemma_cache
     tokens = nltk.word_tokenize(text)
-    lemmatized_tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    lemmatized_tokens = [lemma_cache.lemmatize(token) for token in tokens]
     return ' '.join(lemmatized_tokens)
 
 
@@ -25,19 +28,16 @@ def remove_stops(text, stops):
     return final
 
 
-def clean_docs(docs, stops):
-    lemmatizer = WordNetLemmatizer()
-    final = []
-    for doc in docs:
-        clean_doc = remove_stops(doc.lower(), stops)
-        lemmatized_doc = lemmatize(clean_doc, lemmatizer)
-        final.append(lemmatized_doc)
-    return final
+def clean_docs(docs, stops, n_jobs=1, cache_file=None):
+    # Batched tokenization and lemmatization (the same as lemmatize of each doc)
+    docs_without_stops = [remove_stops(doc.lower(), stops) for doc in docs]
+    return [' '.join(lemmas) for lemmas in lemmatize_texts(docs_without_stops, use_pos_tags=False, n_jobs=n_jobs,
+                                                           cache_file=cache_file)]
 
 
 def preprocess_data(utterances):
     stops = set(stopwords.words("english"))
     stops.update(['um', 'uh', 'affirmative', 'laugh', 'mmhmm', 'oh'])
     stops.remove('from')
-    cleaned_docs = clean_docs(docs=utterances, stops=stops)
+    cleaned_docs = clean_docs(docs=utterances, stops=stops, cache_file=lemma_cache_file)
     return cleaned_docs
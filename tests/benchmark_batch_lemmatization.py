@@ -0,0 +1,71 @@
+"""
+This script benchmarks the batched preprocessing (clean_texts of keywords_rule_based_classifier_V2) against the
+per-utterance clean_text.
+1. Generates 1M synthetic utterances (short repeated responses and random sentences of a conversational vocabulary).
+2. Cleans a sample with the per-utterance clean_text, and all the utterances with clean_texts (in the current
+   process and in worker processes).
+3. Checks that the cleaned texts of the sample are identical, and prints the throughput (utterances per second)
+   of each method. The shared lemma cache is cleared before each timed run, so no run reuses the lemmas of another.
+"""
+
+import time
+
+import numpy as np
+
+from src.models.Rule_Based.keywords_rule_based_classifier_V2 import clean_text, clean_texts, stops
+from src.utils.lemma_cache import get_lemma_cache
+
+SHORT_RESPONSES = ['Yes.', 'Okay.', 'Mm-hmm.', 'Uh-huh.', 'No.', 'Right.', 'Thank you.', 'Yeah, yeah.',
+                   'Okay, thank you so much.', 'Sure.', 'Hello?', 'Bye-bye.']
+VOCABULARY = ('I am calling from a recorded line my name is Anna your care manager with the health plan '
+              'could you please verify your full name and address we are checking on your medications and '
+              'appointments how have you been feeling lately any pain sleeping eating walking doctor nurse '
+              'visits scheduled next week insurance benefits pharmacy refill prescriptions blood pressure sugar '
+              'levels mood energy stress family support transportation questions concerns today tomorrow '
+              'morning afternoon called talked told asked helped needed wanted going doing getting feeling').split()
+
+
+def generate_synthetic_utterances(num_of_utterances=1_000_000, seed=0) -> list:
+    random_state = np.random.RandomState(seed)
+    is_short = random_state.rand(num_of_utterances) < 0.4
+    lengths = random_state.randint(3, 16, size=num_of_utterances)
+    word_probabilities = 1 / np.arange(1, len(VOCABULARY) + 1)  # Zipf-like word frequencies
+    word_probabilities /= word_probabilities.sum()
+    utterances = []
+    for short, length in zip(is_short, lengths):
+        if short:
+            utterances.append(SHORT_RESPONSES[random_state.randint(len(SHORT_RESPONSES))])
+        else:
+            words = random_state.choice(VOCABULARY, size=length, p=word_probabilities)
+            utterances.append(' '.join(words).capitalize() + random_state.choice(['.', '?', ',', '!']))
+    return utterances
+
+
+if __name__ == '__main__':
+    num_of_sample_utterances = 50_000
+    utterances = generate_synthetic_utterances()
+    print(f'Synthetic corpus: {len(utterances)} utterances ({len(set(utterances))} distinct)')
+
+    get_lemma_cache().clear()
+    start_time = time.time()
+    per_utterance_texts = [clean_text(utterance, stops) for utterance in utterances[:num_of_sample_utterances]]
+    per_utterance_throughput = num_of_sample_utterances / (time.time() - start_time)
+
+    get_lemma_cache().clear()
+    start_time = time.time()
+    batched_texts = clean_texts(utterances, stops)
+    batched_throughput = len(utterances) / (time.time() - start_time)
+
+    get_lemma_cache().clear()  # Worker processes start with an empty cache (also with the fork start method)
+    start_time = time.time()
+    parallel_texts = clean_texts(utterances, stops, n_jobs=None)
+    parallel_throughput = len(utterances) / (time.time() - start_time)
+
+    assert per_utterance_texts == batched_texts[:num_of_sample_utterances], 'Batched output is different'
+    assert batched_texts == parallel_texts, 'Multiprocess output is different'
+    print(f'Identical cleaned texts (sample of {num_of_sample_utterances} utterances)')
+    print(f'Per-utterance: {per_utterance_throughput:,.0f} utterances/second (on the sample) | '
+          f'Batched: {batched_throughput:,.0f} utterances/second | '
+          f'Batched, multiprocess: {parallel_throughput:,.0f} utterances/second')
+    print(f'Speedup: {batched_throughput / per_utterance_throughput:.1f}x (batched), '
+          f'{parallel_throughput / per_utterance_throughput:.1f}x (multiprocess)')
@@ -0,0 +1,75 @@
+"""
+This script benchmarks the vectorized identify_care_manager against the original row-wise implementation.
+1. Generates a large synthetic corpus of utterances (random speakers, question marks and 'recorded' lines).
+2. Runs both implementations and checks that the 'is_cm' columns are identical.
+3. Prints the running time of each implementation and the speedup.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import regex as re
+
+from src.data.data_pipeline_functions import identify_care_manager
+
+
+def identify_care_manager_row_wise(df: pd.DataFrame):
+    """
+    The original implementation (a regex and a substring test per row, and a merge of the aggregated flags).
+    """
+    def _count_single_question_marks(row_text):
+        text = row_text.replace(' ', '')
+        pattern = r'(\? *)(?!\?)'
+        matches = re.findall(pattern, text)
+        return len(matches)
+
+    def _has_recorded(row_text):
+        return 'recorded' in row_text.lower()
+
+    df_temp = df.copy()
+    df_temp['num_of_qmarks'] = df_temp['text'].apply(_count_single_question_marks)
+    df_temp['has_recorded'] = df_temp['text'].apply(_has_recorded)
+
+    df_agg = df_temp.groupby(['recording_id', 'speaker']).agg({'num_of_qmarks': 'sum', 'has_recorded': 'sum'}).reset_index()
+    df_agg['max_qmarks'] = df_agg.groupby('recording_id')['num_of_qmarks'].transform('max')
+    df_agg['is_speaker_with_max_qmarks'] = df_agg['num_of_qmarks'] == df_agg['max_qmarks']
+    df_agg['is_speaker_with_recorded'] = df_agg['has_recorded'] > 0
+    df_agg['priority'] = df_agg['is_speaker_with_recorded'].astype(int) * 2 + df_agg[
+        'is_speaker_with_max_qmarks'].astype(int)
+    df_agg['is_cm'] = df_agg.groupby('recording_id')['priority'].rank(method='first', ascending=False) == 1
+
+    df_result = df.merge(df_agg[['recording_id', 'speaker', 'is_cm']], on=['recording_id', 'speaker'], how='left')
+    return df_result
+
+
+def generate_synthetic_corpus(num_of_recordings=20000, utterances_per_recording=30, seed=0) -> pd.DataFrame:
+    random_state = np.random.RandomState(seed)
+    num_of_utterances = num_of_recordings * utterances_per_recording
+    phrases = np.array(['Hello, how are you?', 'This call is recorded for quality.', 'Fine, thanks.',
+                        'Can you hear me? ?', 'What?? Really?', 'I take my medication every day.',
+                        'Is this a good time to talk ?', 'OK.', 'This line is Recorded.', 'Yes.'])
+    return pd.DataFrame({
+        'recording_id': np.repeat([f'recording_{i:06d}' for i in range(num_of_recordings)], utterances_per_recording),
+        'speaker': random_state.choice(['A', 'B', 'C'], size=num_of_utterances, p=[0.45, 0.45, 0.1]),
+        'time': np.tile(np.arange(utterances_per_recording), num_of_recordings),
+        'text': phrases[random_state.randint(len(phrases), size=num_of_utterances)]
+    })
+
+
+if __name__ == '__main__':
+    df = generate_synthetic_corpus()
+    print(f'Synthetic corpus: {df["recording_id"].nunique()} recordings, {len(df)} utterances')
+
+    start_time = time.time()
+    df_row_wise = identify_care_manager_row_wise(df)
+    row_wise_time = time.time() - start_time
+
+    start_time = time.time()
+    df_vectorized = identify_care_manager(df)
+    vectorized_time = time.time() - start_time
+
+    assert (df_row_wise['is_cm'].to_numpy() == df_vectorized['is_cm'].to_numpy()).all(), "'is_cm' is different"
+    print(f'Identical is_cm ({df_vectorized["is_cm"].sum()} CM utterances)')
+    print(f'Row-wise: {row_wise_time:.2f} seconds | Vectorized: {vectorized_time:.2f} seconds | '
+          f'Speedup: {row_wise_time / vectorized_time:.1f}x')
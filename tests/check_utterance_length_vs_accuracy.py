@@ -1,8 +1,8 @@
 import pandas as pd
 import os
 from src.utils.common import get_project_root
-from src.models.Rule_Based.keywords_rule_based_classifier_V2 import clean_text
-from src.utils.constants import MY_STOPS
+from src.models.Rule_Based.keywords_rule_based_classifier_V2 import clean_texts
+from src.utils.constants import MY_STOPS, lemma_cache_file
 from matplotlib import pyplot as plt
 
 """
@@ -48,8 +48,8 @@ df_combined = df1.merge(
     suffixes=['_exp1', '_exp2']
 )
 
-# Apply the clean_text function to the text column
-df_combined['clean_text'] = df_combined['text'].apply(lambda text: clean_text(text, MY_STOPS))
+# Clean the text column (batched clean_text)
+df_combined['clean_text'] = clean_texts(df_combined['text'], MY_STOPS, cache_file=lemma_cache_file)
 
 # Calculate text length after cleaning
 df_combined['text_length'] = df_combined['clean_text'].apply(lambda text: len(text.split()))
@@ -42,14 +42,11 @@ df_leftout = df1_cm[~df1_cm['utterance_id'].isin(df2_cm['utterance_id'])]
 print(df_leftout.columns)
 print(df_leftout.shape)
 
-# Create a dictionary to map utterance_id to Good prediction from df1_cm
-good_prediction_dict = dict(zip(df1_cm['utterance_id'], df1_cm['Good prediction']))
+# Map utterance_id to Good prediction from df1_cm
+good_prediction = df1_cm.drop_duplicates('utterance_id', keep='last').set_index('utterance_id')['Good prediction']
 
 # Create the good_prediction column in df2
-df2['df1_good_prediction'] = df2.apply(
-    lambda row: good_prediction_dict.get(row['utterance_id']) if row['is_cm'] else None,
-    axis=1
-)
+df2['df1_good_prediction'] = df2['utterance_id'].map(good_prediction).where(df2['is_cm'], None)
 
 # Ensure df1 and df2 are aligned on utterance_id for prediction column
 df2 = df2.merge(df1[['utterance_id', 'prediction']], on='utterance_id', suffixes=('', '_df1'))